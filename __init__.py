@@ -1,5 +1,7 @@
 name = "dolphindb"
 from .session import session
+from .session import AsyncSession
+from .session import AsyncTable
 from .session import DBConnectionPool
 from .session import BlockReader
 from .session import PartitionedTableAppender
@@ -0,0 +1,106 @@
+"""Upload throughput of string columns, in rows per second.
+
+Each kind of string column is uploaded with session.upload and the best of several runs is reported:
+    object           DataFrame column of Python str
+    string[pyarrow]  DataFrame column backed by an Arrow string array (requires pyarrow)
+    S, U             numpy fixed-width bytes and unicode arrays, uploaded as vectors
+    double           DataFrame column of float64, as a reference for the cost of the transfer itself
+
+To compare before and after a change of the encoders, run the script with each build of the package against the same server:
+    python upload_strings.py --host 127.0.0.1 --port 8848 --save before.json    # baseline build
+    python upload_strings.py --host 127.0.0.1 --port 8848 --compare before.json # new build
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+import dolphindb as ddb
+
+
+def make_strings(rows, width, distinct):
+    rng = np.random.default_rng(0)
+    letters = np.frombuffer(b"abcdefghijklmnopqrstuvwxyz0123456789", dtype="S1")
+    pool = np.array([b"".join(rng.choice(letters, rng.integers(1, 2 * width))) for _ in range(distinct)])
+    return pool[rng.integers(0, distinct, rows)].astype("U")
+
+
+def make_objects(kind, strings):
+    if kind == "object":
+        return pd.DataFrame({"s": strings.astype(object)})
+    if kind == "string[pyarrow]":
+        return pd.DataFrame({"s": pd.Series(strings, dtype="string[pyarrow]")})
+    if kind == "S":
+        return np.char.encode(strings, "utf-8")
+    if kind == "U":
+        return strings
+    if kind == "double":
+        return pd.DataFrame({"s": np.arange(len(strings), dtype=np.float64)})
+    raise ValueError("unknown kind " + kind)
+
+
+def available_kinds():
+    kinds = ["object", "S", "U", "double"]
+    try:
+        import pyarrow  # noqa: F401
+        kinds.insert(1, "string[pyarrow]")
+    except ImportError:
+        pass
+    return kinds
+
+
+def best_rows_per_second(s, obj, rows, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        s.upload({"bench_strings": obj})
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+        s.run("undef('bench_strings')")
+    return rows / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8848)
+    parser.add_argument("--user", default="admin")
+    parser.add_argument("--password", default="123456")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--width", type=int, default=16, help="average string length")
+    parser.add_argument("--distinct", type=int, default=100000, help="number of distinct strings")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file saved by an earlier run, printed next to the results")
+    args = parser.parse_args()
+
+    s = ddb.session()
+    s.connect(args.host, args.port, args.user, args.password)
+    strings = make_strings(args.rows, args.width, args.distinct)
+    previous = dict()
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+
+    results = dict()
+    print("{:<16} {:>14} {:>14} {:>8}".format("column", "rows/s", "before", "speedup"))
+    for kind in available_kinds():
+        rate = best_rows_per_second(s, make_objects(kind, strings), args.rows, args.repeat)
+        results[kind] = rate
+        before = previous.get(kind)
+        print("{:<16} {:>14,.0f} {:>14} {:>8}".format(
+            kind, rate,
+            "{:,.0f}".format(before) if before else "-",
+            "{:.2f}x".format(rate / before) if before else "-"))
+    s.close()
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,9 +14,17 @@
 #include <pybind11/stl.h>
 #include <string>
 #include <unordered_map>
+#include <type_traits>
 #include <vector>
 #include <map>
 #include <algorithm>
+#include <chrono>
+#include <cmath>
+#include <deque>
+#include <memory>
+#include <mutex>
+#include <thread>
+#include <condition_variable>
 
 #ifndef MAC
     #include <signal.h>
@@ -67,6 +75,533 @@ private:
     std::function<void()> code;
 };
 
+static inline bool readValues(const ddb::VectorSP &vec, ddb::INDEX start, int len, int8_t *buf) { return vec->getChar(start, len, reinterpret_cast<char *>(buf)); }
+static inline bool readValues(const ddb::VectorSP &vec, ddb::INDEX start, int len, int16_t *buf) { return vec->getShort(start, len, reinterpret_cast<short *>(buf)); }
+static inline bool readValues(const ddb::VectorSP &vec, ddb::INDEX start, int len, int32_t *buf) { return vec->getInt(start, len, reinterpret_cast<int *>(buf)); }
+static inline bool readValues(const ddb::VectorSP &vec, ddb::INDEX start, int len, int64_t *buf) { return vec->getLong(start, len, reinterpret_cast<long long *>(buf)); }
+static inline bool readValues(const ddb::VectorSP &vec, ddb::INDEX start, int len, float *buf) { return vec->getFloat(start, len, buf); }
+static inline bool readValues(const ddb::VectorSP &vec, ddb::INDEX start, int len, double *buf) { return vec->getDouble(start, len, buf); }
+
+// Expose the raw values of a fixed-width vector as a numpy array. A vector in fast mode
+// owns one contiguous buffer, which is wrapped without copying; the capsule keeps the
+// vector alive as long as the array. Null values keep their DolphinDB sentinels.
+template <typename T>
+static py::array wrapVector(const ddb::VectorSP &vec) {
+    size_t size = vec->size();
+    if (vec->isFastMode() && vec->getDataArray() != nullptr) {
+        py::capsule owner(new ddb::ConstantSP(vec), [](void *p) { delete reinterpret_cast<ddb::ConstantSP *>(p); });
+        return py::array_t<T>({size}, {sizeof(T)}, reinterpret_cast<const T *>(vec->getDataArray()), owner);
+    }
+    py::array_t<T> arr(size);
+    T *buf = arr.mutable_data();
+    const size_t batch = 1 << 20;
+    for (size_t start = 0; start < size; start += batch) {
+        int len = (int)std::min(batch, size - start);
+        readValues(vec, (ddb::INDEX)start, len, buf + start);
+    }
+    return arr;
+}
+
+static py::object exportVector(const ddb::VectorSP &vec) {
+    switch (vec->getType()) {
+        case ddb::DT_BOOL:
+        case ddb::DT_CHAR:
+            return wrapVector<int8_t>(vec);
+        case ddb::DT_SHORT:
+            return wrapVector<int16_t>(vec);
+        case ddb::DT_INT:
+        case ddb::DT_DATE:
+        case ddb::DT_MONTH:
+        case ddb::DT_TIME:
+        case ddb::DT_MINUTE:
+        case ddb::DT_SECOND:
+        case ddb::DT_DATETIME:
+        case ddb::DT_DATEHOUR:
+            return wrapVector<int32_t>(vec);
+        case ddb::DT_LONG:
+        case ddb::DT_TIMESTAMP:
+        case ddb::DT_NANOTIME:
+        case ddb::DT_NANOTIMESTAMP:
+            return wrapVector<int64_t>(vec);
+        case ddb::DT_FLOAT:
+            return wrapVector<float>(vec);
+        case ddb::DT_DOUBLE:
+            return wrapVector<double>(vec);
+        default:
+            return ddb::DdbPythonUtil::toPython(vec);
+    }
+}
+
+// Describe a table or vector as a list of columns. Fixed-width columns are raw numpy
+// views from exportVector, the others are converted by DdbPythonUtil::toPython. Any other
+// data form is returned converted in "raw".
+static py::dict exportColumns(const ddb::ConstantSP &obj) {
+    py::dict ret;
+    py::list names, types, columns, hasNull;
+    ret["form"] = py::int_((int)obj->getForm());
+    if (obj->getForm() == ddb::DF_TABLE) {
+        ddb::TableSP table = obj;
+        for (int i = 0; i < table->columns(); ++i) {
+            ddb::VectorSP col = table->getColumn(i);
+            names.append(py::str(table->getColumnName(i)));
+            types.append(py::int_((int)col->getType()));
+            hasNull.append(py::bool_(col->hasNull()));
+            columns.append(exportVector(col));
+        }
+    } else if (obj->getForm() == ddb::DF_VECTOR) {
+        ddb::VectorSP vec = obj;
+        names.append(py::str(vec->getName()));
+        types.append(py::int_((int)vec->getType()));
+        hasNull.append(py::bool_(vec->hasNull()));
+        columns.append(exportVector(vec));
+    } else {
+        ret["raw"] = ddb::DdbPythonUtil::toPython(obj);
+    }
+    ret["names"] = names;
+    ret["types"] = types;
+    ret["columns"] = columns;
+    ret["hasNull"] = hasNull;
+    return ret;
+}
+
+// Bulk encoders for string columns, used by toDolphinDBFast. They read the UTF-8 or UCS4 buffers
+// directly (or the str objects of an object column through the C API) and append the values to a
+// STRING vector in batches. Null values become empty strings.
+static const int STRING_BATCH_SIZE = 4096;
+
+static void appendStrings(ddb::VectorSP &vec, std::vector<std::string> &batch) {
+    if (!batch.empty()) {
+        vec->appendString(batch.data(), (int)batch.size());
+        batch.clear();
+    }
+}
+
+static void appendUtf8(std::string &out, uint32_t cp) {
+    if (cp < 0x80) {
+        out.push_back((char)cp);
+    } else if (cp < 0x800) {
+        out.push_back((char)(0xC0 | (cp >> 6)));
+        out.push_back((char)(0x80 | (cp & 0x3F)));
+    } else if (cp < 0x10000) {
+        out.push_back((char)(0xE0 | (cp >> 12)));
+        out.push_back((char)(0x80 | ((cp >> 6) & 0x3F)));
+        out.push_back((char)(0x80 | (cp & 0x3F)));
+    } else {
+        out.push_back((char)(0xF0 | (cp >> 18)));
+        out.push_back((char)(0x80 | ((cp >> 12) & 0x3F)));
+        out.push_back((char)(0x80 | ((cp >> 6) & 0x3F)));
+        out.push_back((char)(0x80 | (cp & 0x3F)));
+    }
+}
+
+// numpy arrays of dtype S (bytes, NUL padded) or U (UCS4, NUL padded).
+static ddb::VectorSP numpyStringsToDolphinDB(const py::array &arr) {
+    char kind = arr.dtype().kind();
+    py::array data = py::array::ensure(arr, py::array::c_style);
+    size_t size = data.size();
+    size_t itemsize = data.itemsize();
+    const char *base = static_cast<const char *>(data.data());
+    ddb::VectorSP vec = ddb::Util::createVector(ddb::DT_STRING, 0, size);
+    std::vector<std::string> batch;
+    batch.reserve(STRING_BATCH_SIZE);
+    for (size_t i = 0; i < size; ++i) {
+        const char *item = base + i * itemsize;
+        if (kind == 'S') {
+            size_t len = itemsize;
+            while (len > 0 && item[len - 1] == '\0') --len;
+            batch.emplace_back(item, len);
+        } else {
+            const uint32_t *cps = reinterpret_cast<const uint32_t *>(item);
+            size_t len = itemsize / 4;
+            while (len > 0 && cps[len - 1] == 0) --len;
+            std::string s;
+            s.reserve(len);
+            for (size_t j = 0; j < len; ++j) appendUtf8(s, cps[j]);
+            batch.push_back(std::move(s));
+        }
+        if (batch.size() == STRING_BATCH_SIZE) appendStrings(vec, batch);
+    }
+    appendStrings(vec, batch);
+    return vec;
+}
+
+template <typename OFFSET>
+static void appendArrowStrings(ddb::VectorSP &vec, std::vector<std::string> &batch, const py::object &chunk) {
+    py::list buffers = chunk.attr("buffers")();
+    size_t offset = chunk.attr("offset").cast<size_t>();
+    size_t length = py::len(chunk);
+    const uint8_t *validity = nullptr;
+    const char *data = nullptr;
+    py::buffer_info validityInfo, offsetsInfo, dataInfo;
+    if (!buffers[0].is_none()) {
+        validityInfo = py::buffer(buffers[0]).request();
+        validity = static_cast<const uint8_t *>(validityInfo.ptr);
+    }
+    offsetsInfo = py::buffer(buffers[1]).request();
+    const OFFSET *offsets = static_cast<const OFFSET *>(offsetsInfo.ptr);
+    if (!buffers[2].is_none()) {
+        dataInfo = py::buffer(buffers[2]).request();
+        data = static_cast<const char *>(dataInfo.ptr);
+    }
+    for (size_t i = offset; i < offset + length; ++i) {
+        if ((validity != nullptr && !(validity[i >> 3] & (1 << (i & 7)))) || data == nullptr) {
+            batch.emplace_back();
+        } else {
+            batch.emplace_back(data + offsets[i], (size_t)(offsets[i + 1] - offsets[i]));
+        }
+        if (batch.size() == STRING_BATCH_SIZE) appendStrings(vec, batch);
+    }
+}
+
+static bool isArrowStringArray(const py::object &arr) {
+    if (!py::hasattr(arr, "type") || !(py::hasattr(arr, "buffers") || py::hasattr(arr, "chunks"))) {
+        return false;
+    }
+    std::string type = py::str(arr.attr("type"));
+    return type == "string" || type == "utf8" || type == "large_string" || type == "large_utf8";
+}
+
+// pyarrow Array or ChunkedArray of type string or large_string.
+static ddb::VectorSP arrowStringsToDolphinDB(const py::object &arr) {
+    std::string type = py::str(arr.attr("type"));
+    bool large = type == "large_string" || type == "large_utf8";
+    py::list chunks;
+    if (py::hasattr(arr, "chunks")) {
+        chunks = arr.attr("chunks");
+    } else {
+        chunks.append(arr);
+    }
+    ddb::VectorSP vec = ddb::Util::createVector(ddb::DT_STRING, 0, (ddb::INDEX)py::len(arr));
+    std::vector<std::string> batch;
+    batch.reserve(STRING_BATCH_SIZE);
+    for (py::handle chunk : chunks) {
+        if (large) {
+            appendArrowStrings<int64_t>(vec, batch, py::reinterpret_borrow<py::object>(chunk));
+        } else {
+            appendArrowStrings<int32_t>(vec, batch, py::reinterpret_borrow<py::object>(chunk));
+        }
+    }
+    appendStrings(vec, batch);
+    return vec;
+}
+
+// numpy object array holding str values, None or NaN. Returns a null pointer if another type is met
+// or if there is no str at all, so that the caller falls back to DdbPythonUtil::toDolphinDB.
+static ddb::VectorSP objectStringsToDolphinDB(const py::array &arr) {
+    py::array data = py::array::ensure(arr, py::array::c_style);
+    size_t size = data.size();
+    PyObject *const *items = static_cast<PyObject *const *>(data.data());
+    ddb::VectorSP vec = ddb::Util::createVector(ddb::DT_STRING, 0, size);
+    std::vector<std::string> batch;
+    batch.reserve(STRING_BATCH_SIZE);
+    bool hasString = false;
+    for (size_t i = 0; i < size; ++i) {
+        PyObject *item = items[i];
+        if (PyUnicode_Check(item)) {
+            Py_ssize_t len;
+            const char *utf8 = PyUnicode_AsUTF8AndSize(item, &len);
+            if (utf8 == nullptr) {
+                throw py::error_already_set();
+            }
+            batch.emplace_back(utf8, (size_t)len);
+            hasString = true;
+        } else if (item == Py_None || (PyFloat_Check(item) && std::isnan(PyFloat_AS_DOUBLE(item)))) {
+            batch.emplace_back();
+        } else {
+            return nullptr;
+        }
+        if (batch.size() == STRING_BATCH_SIZE) appendStrings(vec, batch);
+    }
+    if (!hasString) {
+        return nullptr;
+    }
+    appendStrings(vec, batch);
+    return vec;
+}
+
+// pandas Categorical with str categories, as a SYMBOL vector. Each category is inserted into the symbol
+// base once and the codes are mapped to symbol indices, so the values are never expanded to strings.
+// Returns a null pointer if a category is not a str.
+static ddb::VectorSP categoricalToDolphinDB(const py::object &series) {
+    py::object cat = series.attr("cat");
+    ddb::SymbolBaseSP symbolBase = new ddb::SymbolBase();
+    std::vector<int> indices;
+    for (py::handle category : cat.attr("categories")) {
+        if (!PyUnicode_Check(category.ptr())) {
+            return nullptr;
+        }
+        indices.push_back(symbolBase->findAndInsert(category.cast<std::string>()));
+    }
+    int nullIndex = symbolBase->findAndInsert("");
+    py::array_t<int32_t, py::array::c_style | py::array::forcecast> codes(cat.attr("codes").attr("to_numpy")());
+    size_t size = codes.size();
+    const int32_t *data = codes.data();
+    ddb::VectorSP vec = ddb::Util::createSymbolVector(symbolBase, 0, size);
+    std::vector<int> batch;
+    batch.reserve(STRING_BATCH_SIZE);
+    for (size_t i = 0; i < size; ++i) {
+        batch.push_back(data[i] < 0 ? nullIndex : indices[data[i]]);
+        if (batch.size() == STRING_BATCH_SIZE) {
+            vec->appendInt(batch.data(), (int)batch.size());
+            batch.clear();
+        }
+    }
+    if (!batch.empty()) {
+        vec->appendInt(batch.data(), (int)batch.size());
+    }
+    return vec;
+}
+
+// Convert one column (pandas Series, numpy array or pyarrow array) by a fast path, or return a null
+// pointer if there is none for its type.
+static ddb::ConstantSP columnToDolphinDBFast(const py::object &col) {
+    if (isArrowStringArray(col)) {
+        return arrowStringsToDolphinDB(col);
+    }
+    if (py::isinstance<py::array>(col)) {
+        py::array arr = py::reinterpret_borrow<py::array>(col);
+        if (arr.ndim() != 1) {
+            return nullptr;
+        }
+        char kind = arr.dtype().kind();
+        if (kind == 'S' || kind == 'U') {
+            return numpyStringsToDolphinDB(arr);
+        }
+        if (kind == 'O') {
+            return objectStringsToDolphinDB(arr);
+        }
+        return nullptr;
+    }
+    if (!py::isinstance(col, preserved_->pandas_.attr("Series"))) {
+        return nullptr;
+    }
+    std::string dtype = py::str(col.attr("dtype"));
+    if (dtype == "category") {
+        return categoricalToDolphinDB(col);
+    }
+    py::object values = col.attr("array");
+    if (py::hasattr(values, "_pa_array") && isArrowStringArray(values.attr("_pa_array"))) {
+        return arrowStringsToDolphinDB(values.attr("_pa_array"));
+    }
+    if (py::hasattr(values, "_data") && isArrowStringArray(values.attr("_data"))) {
+        return arrowStringsToDolphinDB(values.attr("_data"));
+    }
+    if (dtype == "object") {
+        return objectStringsToDolphinDB(col.attr("to_numpy")());
+    }
+    return nullptr;
+}
+
+// DdbPythonUtil::toDolphinDB with fast paths for string columns. A DataFrame is converted column by
+// column: the columns with a fast path are encoded directly, the others are converted together by
+// DdbPythonUtil::toDolphinDB, and the table is assembled from both.
+static ddb::ConstantSP toDolphinDBFast(const py::object &obj) {
+    if (py::isinstance<py::array>(obj)) {
+        ddb::ConstantSP vec = columnToDolphinDBFast(obj);
+        return vec.isNull() ? ddb::DdbPythonUtil::toDolphinDB(obj) : vec;
+    }
+    if (!py::isinstance(obj, preserved_->pddataframe_)) {
+        return ddb::DdbPythonUtil::toDolphinDB(obj);
+    }
+    py::object columns = obj.attr("columns");
+    if (!columns.attr("is_unique").cast<bool>()) {
+        return ddb::DdbPythonUtil::toDolphinDB(obj);
+    }
+    vector<std::string> names;
+    vector<ddb::ConstantSP> cols;
+    py::list rest;
+    vector<size_t> restPos;
+    for (py::handle item : obj.attr("items")()) {
+        py::tuple pair = py::reinterpret_borrow<py::tuple>(item);
+        names.push_back(py::str(pair[0]));
+        ddb::ConstantSP col = columnToDolphinDBFast(py::reinterpret_borrow<py::object>(pair[1]));
+        if (col.isNull()) {
+            rest.append(pair[0]);
+            restPos.push_back(cols.size());
+        }
+        cols.push_back(col);
+    }
+    if (restPos.size() == cols.size()) {
+        return ddb::DdbPythonUtil::toDolphinDB(obj);
+    }
+    if (!restPos.empty()) {
+        ddb::TableSP restTable = ddb::DdbPythonUtil::toDolphinDB(obj.attr("__getitem__")(rest));
+        for (size_t i = 0; i < restPos.size(); ++i) {
+            cols[restPos[i]] = restTable->getColumn((int)i);
+        }
+    }
+    return ddb::Util::createTable(names, cols);
+}
+
+// Adaptive compression of the tables sent to the server. A table estimated at thresholdBytes or more
+// gets one method per column: DELTA for integral and temporal columns, LZ4 for the others. Smaller
+// tables are sent uncompressed. A negative threshold disables the policy.
+class CompressPolicy {
+public:
+    void setThreshold(long long thresholdBytes) {
+        thresholdBytes_ = thresholdBytes;
+    }
+
+    void apply(const ddb::ConstantSP &obj) {
+        if (thresholdBytes_ < 0 || obj.isNull() || obj->getForm() != ddb::DF_TABLE) {
+            return;
+        }
+        ddb::TableSP table = obj;
+        long long rowBytes = 0;
+        for (int i = 0; i < table->columns(); ++i) {
+            int unit = ddb::Util::getDataTypeSize(table->getColumnType(i));
+            rowBytes += unit > 0 ? unit : 16;
+        }
+        long long bytes = rowBytes * table->rows();
+        bool compress = bytes >= thresholdBytes_;
+        vector<ddb::COMPRESS_METHOD> methods;
+        for (int i = 0; i < table->columns(); ++i) {
+            methods.push_back(compress ? methodOf(table->getColumnType(i)) : ddb::COMPRESS_NONE);
+        }
+        table->setColumnCompressMethods(methods);
+        tables_ += 1;
+        bytes_ += bytes;
+        if (compress) {
+            compressedTables_ += 1;
+            compressedBytes_ += bytes;
+        }
+    }
+
+    py::dict getStats() {
+        py::dict stats;
+        stats["threshold"] = py::int_(thresholdBytes_);
+        stats["tables"] = py::int_(tables_);
+        stats["compressedTables"] = py::int_(compressedTables_);
+        stats["bytes"] = py::int_(bytes_);
+        stats["compressedBytes"] = py::int_(compressedBytes_);
+        return stats;
+    }
+
+private:
+    static ddb::COMPRESS_METHOD methodOf(ddb::DATA_TYPE type) {
+        ddb::DATA_CATEGORY category = ddb::Util::getCategory(type);
+        if ((category == ddb::INTEGRAL && type != ddb::DT_CHAR) || category == ddb::TEMPORAL) {
+            return ddb::COMPRESS_DELTA;
+        }
+        return ddb::COMPRESS_LZ4;
+    }
+
+    long long thresholdBytes_ = -1;
+    long long tables_ = 0;
+    long long compressedTables_ = 0;
+    long long bytes_ = 0;
+    long long compressedBytes_ = 0;
+};
+
+// Calls a Python callback when a task of a DBConnectionPool finishes. The SDK only exposes isFinished,
+// so a single thread checks the pending tasks without the GIL and takes the GIL only to run the callbacks.
+// The pool runs tasks in submission order on threadNum connections, so a task can only have finished if it is
+// among the oldest pending ones: each scan checks at most 2 * threadNum tasks. Scans are spaced by a wait that
+// doubles, up to 1 ms, when nothing finished and halves, down to 20 us, when something did.
+class TaskWatcher {
+public:
+    TaskWatcher(ddb::DBConnectionPool &pool, int threadNum): pool_(pool), scanLimit_(std::max(1, 2 * threadNum)), stop_(false) {
+    }
+    ~TaskWatcher() {
+        stop();
+    }
+    // Called with the GIL held.
+    void watch(int taskId, py::object callback) {
+        std::lock_guard<std::mutex> lock(mutex_);
+        if (stop_)
+            throw std::runtime_error("<Exception> in watch: the pool has been shut down.");
+        callbacks_[taskId] = callback;
+        if (!thread_.joinable())
+            thread_ = std::thread([this]() { loop(); });
+        wakeup_.notify_one();
+    }
+    // Stops the thread and drops the pending callbacks without calling them. Called with the GIL held.
+    void stop() {
+        {
+            std::lock_guard<std::mutex> lock(mutex_);
+            stop_ = true;
+            wakeup_.notify_one();
+        }
+        if (thread_.joinable()) {
+            if (PyGILState_Check()) {
+                // the thread may be waiting for the GIL to run a callback
+                py::gil_scoped_release release;
+                thread_.join();
+            } else {
+                thread_.join();
+            }
+        }
+        std::lock_guard<std::mutex> lock(mutex_);
+        callbacks_.clear();
+    }
+
+private:
+    void loop() {
+        const std::chrono::microseconds minWait(20), maxWait(1000);
+        std::chrono::microseconds wait = minWait;
+        vector<int> pending, finished;
+        while (true) {
+            pending.clear();
+            {
+                std::unique_lock<std::mutex> lock(mutex_);
+                if (callbacks_.empty() && !stop_)
+                    wakeup_.wait(lock, [this]() { return !callbacks_.empty() || stop_; });
+                if (stop_)
+                    return;
+                // task ids are allocated in increasing order, so the map starts with the oldest tasks
+                for (auto it = callbacks_.begin(); it != callbacks_.end() && (int)pending.size() < scanLimit_; ++it)
+                    pending.push_back(it->first);
+            }
+            finished.clear();
+            for (int taskId : pending) {
+                try {
+                    if (pool_.isFinished(taskId))
+                        finished.push_back(taskId);
+                } catch (...) {
+                    // report it through getData, which raises the error of the task
+                    finished.push_back(taskId);
+                }
+            }
+            if (finished.empty()) {
+                wait = std::min(wait * 2, maxWait);
+            } else {
+                wait = std::max(wait / 2, minWait);
+                runCallbacks(finished);
+            }
+            std::unique_lock<std::mutex> lock(mutex_);
+            wakeup_.wait_for(lock, wait, [this]() { return stop_; });
+        }
+    }
+
+    void runCallbacks(const vector<int> &finished) {
+        py::gil_scoped_acquire acquire;
+        for (int taskId : finished) {
+            py::object callback;
+            {
+                std::lock_guard<std::mutex> lock(mutex_);
+                auto it = callbacks_.find(taskId);
+                if (it == callbacks_.end())
+                    continue;
+                callback = it->second;
+                callbacks_.erase(it);
+            }
+            try {
+                callback(taskId);
+            } catch (py::error_already_set &) {
+                // the callback only schedules work on an event loop, which may already be closed
+            }
+        }
+    }
+
+    ddb::DBConnectionPool &pool_;
+    int scanLimit_;
+    std::map<int, py::object> callbacks_;
+    bool stop_;
+    std::mutex mutex_;
+    std::condition_variable wakeup_;
+    std::thread thread_;
+};
+
 class SessionImpl;
 void signal_handler_fun(int signum);
 
@@ -75,7 +610,7 @@ public:
     DBConnectionPoolImpl(const std::string& hostName, int port, int threadNum = 10, const std::string& userId = "", const std::string& password = "",
             bool loadBalance = false, bool highAvailability = false, bool compress = false, bool reConnect = false, bool python = false)
             :dbConnectionPool_(hostName, port, threadNum, userId, password,loadBalance,highAvailability,compress,reConnect,python),
-                host_(hostName), port_(port), threadNum_(threadNum), userId_(userId), password_(password) {}
+                host_(hostName), port_(port), threadNum_(threadNum), userId_(userId), password_(password), watcher_(dbConnectionPool_, threadNum) {}
     ~DBConnectionPoolImpl() {}
     py::object run(const string &script, int taskId) {
         try {
@@ -88,7 +623,8 @@ public:
         vector<ddb::ConstantSP> ddbArgs;
         for (py::handle one : args) {
             py::object pyobj = py::reinterpret_borrow<py::object>(one);
-            ddb::ConstantSP pcp = ddb::DdbPythonUtil::toDolphinDB(pyobj);
+            ddb::ConstantSP pcp = toDolphinDBFast(pyobj);
+            compressPolicy_.apply(pcp);
             ddbArgs.push_back(pcp);
         }
         try {
@@ -124,11 +660,39 @@ public:
         }
         vector<ddb::ConstantSP> ddbArgs;
         for (auto it = args.begin(); it != args.end(); ++it) { ddbArgs.push_back(ddb::DdbPythonUtil::toDolphinDB(py::reinterpret_borrow<py::object>(*it))); }
+        for (auto &arg : ddbArgs) { compressPolicy_.apply(arg); }
         try {
             dbConnectionPool_.runPy(funcName, ddbArgs, taskId, 4, 2, 0, clearMemory,pickleTableToList);
         } CATCH_EXCEPTION("<Exception> in run: ")
         return py::none();
     }
+    // Submits funcName(*argTuples[i]) as task firstTaskId + i for every i. All arguments are converted before the first
+    // task is submitted, and an object passed to several calls, e.g. a shared DataFrame, is converted once.
+    void runBatch(const string &funcName, int firstTaskId, const py::list &argTuples, bool clearMemory) {
+        vector<vector<ddb::ConstantSP>> batch;
+        batch.reserve(argTuples.size());
+        std::unordered_map<PyObject*, ddb::ConstantSP> converted;
+        for (py::handle argTuple : argTuples) {
+            vector<ddb::ConstantSP> ddbArgs;
+            for (py::handle one : py::reinterpret_borrow<py::tuple>(argTuple)) {
+                auto it = converted.find(one.ptr());
+                if (it == converted.end()) {
+                    ddb::ConstantSP pcp = toDolphinDBFast(py::reinterpret_borrow<py::object>(one));
+                    compressPolicy_.apply(pcp);
+                    it = converted.emplace(one.ptr(), pcp).first;
+                }
+                ddbArgs.push_back(it->second);
+            }
+            batch.push_back(std::move(ddbArgs));
+        }
+        try {
+            py::gil_scoped_release release;
+            for (size_t i = 0; i < batch.size(); ++i) {
+                dbConnectionPool_.runPy(funcName, batch[i], firstTaskId + (int)i, 4, 2, 0, clearMemory, false);
+            }
+        } CATCH_EXCEPTION("<Exception> in runBatch: ")
+    }
+
     bool isFinished(int taskId) {
         bool isFinished;
         try {
@@ -143,11 +707,16 @@ public:
         } CATCH_EXCEPTION("<Exception> in getData: ")
         return result;
     }
+    // Calls callback(taskId) once the task is finished, on a thread of the pool.
+    void watch(int taskId, py::object callback) {
+        watcher_.watch(taskId, callback);
+    }
     void shutDown() {
         host_ = "";
         port_ = 0;
         userId_ = "";
         password_ = "";
+        watcher_.stop();
         dbConnectionPool_.shutDown();
     }
 
@@ -163,38 +732,239 @@ public:
     ddb::DBConnectionPool& getPool() {
         return dbConnectionPool_;
     }
+
+    void setCompressThreshold(long long thresholdBytes) {
+        compressPolicy_.setThreshold(thresholdBytes);
+    }
+
+    py::dict getCompressStats() {
+        return compressPolicy_.getStats();
+    }
     
 private:
     ddb::DBConnectionPool dbConnectionPool_;
+    CompressPolicy compressPolicy_;
     std::string host_;
     int port_;
     int threadNum_;
     std::string userId_;
     std::string password_;
+    TaskWatcher watcher_;
+};
+
+// Reads up to capacity blocks ahead of the consumer on a background thread.
+// Blocks are kept as deserialized ddb objects, the conversion to Python happens in the consumer with the GIL held.
+// The thread owns a reference to the prefetcher, so dropping or cancelling a reader never waits for a block in flight.
+class BlockPrefetcher {
+public:
+    static std::shared_ptr<BlockPrefetcher> start(ddb::BlockReaderSP reader, int capacity) {
+        std::shared_ptr<BlockPrefetcher> prefetcher(new BlockPrefetcher(reader, capacity));
+        std::thread([prefetcher]() { prefetcher->fetch(); }).detach();
+        return prefetcher;
+    }
+    // Asks the thread to exit once the block being received, if any, is complete.
+    void requestStop() {
+        std::lock_guard<std::mutex> lock(mutex_);
+        stop_ = true;
+        notFull_.notify_all();
+    }
+    // Stops the thread and discards the prefetched blocks without waiting. Returns whether the thread had not yet reached
+    // the end of the result, that is, whether the connection may still hold blocks. Only the prefetcher's own state is
+    // read, as the thread may be inside the reader.
+    bool cancel() {
+        std::lock_guard<std::mutex> lock(mutex_);
+        stop_ = true;
+        blocks_.clear();
+        notFull_.notify_all();
+        return !exhausted_;
+    }
+    // Stops the thread and waits until it has exited.
+    void stop() {
+        requestStop();
+        std::unique_lock<std::mutex> lock(mutex_);
+        notEmpty_.wait(lock, [this]() { return finished_; });
+    }
+    // Waits until a block is available or the reader is exhausted.
+    bool hasNext() {
+        std::unique_lock<std::mutex> lock(mutex_);
+        notEmpty_.wait(lock, [this]() { return !blocks_.empty() || finished_; });
+        return !blocks_.empty() || !error_.empty();
+    }
+    // Also returns the time the thread spent receiving and deserializing the block.
+    ddb::ConstantSP pop(double &seconds) {
+        std::unique_lock<std::mutex> lock(mutex_);
+        notEmpty_.wait(lock, [this]() { return !blocks_.empty() || finished_; });
+        if (blocks_.empty()) {
+            if (!error_.empty()) {
+                // The error is reported once, hasNext returns false afterwards.
+                std::string error;
+                error.swap(error_);
+                throw std::runtime_error(error);
+            }
+            throw std::runtime_error("<Exception> in read: no more data to read.");
+        }
+        ddb::ConstantSP block = blocks_.front().first;
+        seconds = blocks_.front().second;
+        blocks_.pop_front();
+        notFull_.notify_one();
+        return block;
+    }
+    // Discards the prefetched blocks. The caller skips the remaining blocks on the reader once the thread has stopped.
+    void clear() {
+        std::lock_guard<std::mutex> lock(mutex_);
+        blocks_.clear();
+    }
+
+private:
+    BlockPrefetcher(ddb::BlockReaderSP reader, int capacity): reader_(reader), capacity_(capacity), finished_(false), stop_(false), exhausted_(false) {
+    }
+    void fetch() {
+        try {
+            while (true) {
+                {
+                    std::unique_lock<std::mutex> lock(mutex_);
+                    notFull_.wait(lock, [this]() { return (int)blocks_.size() < capacity_ || stop_; });
+                    if (stop_)
+                        break;
+                }
+                if (!reader_->hasNext()) {
+                    std::lock_guard<std::mutex> lock(mutex_);
+                    exhausted_ = true;
+                    break;
+                }
+                auto start = std::chrono::steady_clock::now();
+                ddb::ConstantSP block = reader_->read();
+                double seconds = std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+                std::lock_guard<std::mutex> lock(mutex_);
+                blocks_.emplace_back(block, seconds);
+                notEmpty_.notify_one();
+            }
+        } catch (std::exception &ex) {
+            std::lock_guard<std::mutex> lock(mutex_);
+            error_ = std::string("<Exception> in read: ") + ex.what();
+        } catch (...) {
+            std::lock_guard<std::mutex> lock(mutex_);
+            error_ = "<Exception> in read: unknow exception.";
+        }
+        std::lock_guard<std::mutex> lock(mutex_);
+        finished_ = true;
+        notEmpty_.notify_all();
+    }
+
+    ddb::BlockReaderSP reader_;
+    int capacity_;
+    std::deque<std::pair<ddb::ConstantSP, double>> blocks_;
+    std::string error_;
+    bool finished_;
+    bool stop_;
+    bool exhausted_;
+    std::mutex mutex_;
+    std::condition_variable notEmpty_;
+    std::condition_variable notFull_;
 };
 
 class BlockReader{
 public:
-    BlockReader(ddb::BlockReaderSP reader): reader_(reader){
+    BlockReader(ddb::BlockReaderSP reader, int prefetch = 0): reader_(reader), state_(std::make_shared<State>()){
+        if (prefetch > 0)
+            state_->prefetcher = BlockPrefetcher::start(reader, prefetch);
     }
     ~BlockReader(){
     }
     void skipAll() {
+        if (state_->cancelled)
+            return;
+        if (state_->prefetcher != nullptr) {
+            py::gil_scoped_release release;
+            state_->prefetcher->stop();
+            state_->prefetcher->clear();
+        }
         reader_->skipAll();
     }
+    // Stops reading without consuming the remaining blocks and returns whether any block was left on the connection.
+    // In that case the connection must be reopened before it is used again, because the socket may still hold part of the result.
+    // With prefetch, call waitStopped before closing the connection: the thread may still be receiving a block.
+    bool cancel() {
+        if (state_->cancelled)
+            return false;
+        state_->cancelled = true;
+        if (state_->prefetcher != nullptr)
+            return state_->prefetcher->cancel();
+        return reader_->hasNext();
+    }
+    // Waits until the prefetch thread, if any, has left the reader. Once the job is cancelled on the server, the block in
+    // flight ends with the job's error or, if the server is unreachable, when the keep-alive of the connection fails.
+    void waitStopped() {
+        if (state_->prefetcher == nullptr)
+            return;
+        py::gil_scoped_release release;
+        state_->prefetcher->stop();
+    }
     py::bool_ hasNext(){
+        if (state_->cancelled)
+            return py::bool_(false);
+        if (state_->prefetcher != nullptr) {
+            bool ret;
+            {
+                py::gil_scoped_release release;
+                ret = state_->prefetcher->hasNext();
+            }
+            return py::bool_(ret);
+        }
         return py::bool_(reader_->hasNext());
     }
     py::object read(){
+        if (state_->cancelled)
+            throw std::runtime_error("<Exception> in read: the reader has been cancelled.");
         py::object ret;
+        ddb::ConstantSP block;
+        double receiveSeconds = 0;
+        if (state_->prefetcher != nullptr) {
+            // pop reports errors of the prefetch thread as std::runtime_error with the message already prefixed
+            py::gil_scoped_release release;
+            block = state_->prefetcher->pop(receiveSeconds);
+        }
+        auto start = std::chrono::steady_clock::now();
         try{
-            ret = ddb::DdbPythonUtil::toPython(reader_->read());
+            if (block.isNull())
+                block = reader_->read();
+            lastTypes_.clear();
+            if (block->getForm() == ddb::DF_TABLE) {
+                ddb::TableSP table = block;
+                for (int i = 0; i < table->columns(); ++i)
+                    lastTypes_.push_back(table->getColumnType(i));
+            } else {
+                lastTypes_.push_back(block->getType());
+            }
+            ret = ddb::DdbPythonUtil::toPython(block);
         } CATCH_EXCEPTION("<Exception> in read: ")
+        lastSeconds_ = receiveSeconds + std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
         return ret;
     }
+    // DolphinDB types of the columns of the last block, used to estimate the row width.
+    std::vector<int> lastTypes() {
+        return lastTypes_;
+    }
+    // Time spent receiving and converting the last block, excluding the time it waited in the prefetch queue.
+    double lastSeconds() {
+        return lastSeconds_;
+    }
 
 private:
+    // Shared by the copies made when the reader is returned to Python, the prefetch thread is stopped with the last one.
+    struct State {
+        bool cancelled = false;
+        std::shared_ptr<BlockPrefetcher> prefetcher;
+        ~State() {
+            if (prefetcher != nullptr)
+                prefetcher->requestStop();
+        }
+    };
+
     ddb::BlockReaderSP reader_;
+    std::shared_ptr<State> state_;
+    std::vector<int> lastTypes_;
+    double lastSeconds_ = 0;
 };
 
 class PartitionedTableAppender{
@@ -206,7 +976,7 @@ public:
             throw std::runtime_error(std::string("table must be a DataFrame!"));
         int insertRows;
         try {
-            insertRows = partitionedTableAppender_.append(ddb::DdbPythonUtil::toDolphinDB(table));
+            insertRows = partitionedTableAppender_.append(toDolphinDBFast(table));
         } CATCH_EXCEPTION("<Exception> in append: ")
         return insertRows;
     }
@@ -264,7 +1034,8 @@ class SessionImpl {
 public:
     SessionImpl(bool enableSSL=false, bool enableASYN=false, int keepAliveTime=7200, bool compress=false, bool enablePickle=true, bool python=false)
         : host_(), port_(-1), userId_(), password_(), encrypted_(true),
-            dbConnection_(enableSSL,enableASYN, keepAliveTime, compress, python), nullValuePolicy_([](ddb::VectorSP) {}), subscriber_(nullptr),subscriberPool_(nullptr),keepAliveTime_(keepAliveTime) {
+            dbConnection_(enableSSL,enableASYN, keepAliveTime, compress, python), nullValuePolicy_([](ddb::VectorSP) {}), subscriber_(nullptr),subscriberPool_(nullptr),keepAliveTime_(keepAliveTime),
+            enablePickle_(enablePickle) {
                 dbConnection_.enablePickle(enablePickle);
             }
     
@@ -275,30 +1046,32 @@ public:
         userId_ = userId;
         password_ = password;
         bool isSuccess = false;
-        if(keepAliveTime > 0){
-            dbConnection_.setKeepAliveTime(keepAliveTime);
-        }
         try {
-            isSuccess = dbConnection_.connect(host_, port_, userId_, password_, startup, highAvailability, highAvailabilitySites, keepAliveTime, reconnect);
+            isSuccess = withConnection([&](ddb::DBConnection &conn) {
+                if(keepAliveTime > 0){
+                    conn.setKeepAliveTime(keepAliveTime);
+                }
+                return conn.connect(host_, port_, userId_, password_, startup, highAvailability, highAvailabilitySites, keepAliveTime, reconnect);
+            });
         } CATCH_EXCEPTION("<Exception> in connect: ")
         return isSuccess;
     }
 
     void setInitScript(string script) {
         try {
-            dbConnection_.setInitScript(script);
+            withConnection([&](ddb::DBConnection &conn) { conn.setInitScript(script); });
         } CATCH_EXCEPTION("<Exception> in setInitScript: ")
     }
 
     string getInitScript() {
         try {
-            return dbConnection_.getInitScript();
+            return withConnection([](ddb::DBConnection &conn) { return conn.getInitScript(); });
         } CATCH_EXCEPTION("<Exception> in getInitScript: ")
     }
 
     void login(const std::string &userId, const std::string &password, bool enableEncryption) {
         try {
-           dbConnection_.login(userId, password, enableEncryption);
+            withConnection([&](ddb::DBConnection &conn) { conn.login(userId, password, enableEncryption); });
         } CATCH_EXCEPTION("<Exception> in login: ")
     }
 
@@ -307,13 +1080,31 @@ public:
         port_ = 0;
         userId_ = "";
         password_ = "";
-        dbConnection_.close();
+        withConnection([](ddb::DBConnection &conn) { conn.close(); });
     }
 
+    // Not serialized with the connection: cancelRunningJobs reads it while another thread is running a job.
     const string getSessionId(){
         return dbConnection_.getSessionId();
     }
 
+    // Cancels the console jobs of this session from a separate connection, as the running connection is busy.
+    void cancelRunningJobs() {
+        SessionImpl session(false, false, 7200, false, true, false);
+        session.connect(host_, port_, userId_, password_);
+        ddb::ConstantSP jobs = session.runcpp("string(exec rootJobId from getConsoleJobs() where sessionId = "+ getSessionId() + ")");
+        if(jobs->isVector() && jobs->size() > 0 ) {
+            vector<ddb::ConstantSP> args;
+            args.emplace_back(jobs);
+            session.runcpp("cancelConsoleJob", args);
+        }
+    }
+
+    void cancelJobs() {
+        py::gil_scoped_release release;
+        cancelRunningJobs();
+    }
+
     py::object loadPickleFile(const std::string &filepath){
         return ddb::DdbPythonUtil::loadPickleFile(filepath);
     }
@@ -323,10 +1114,16 @@ public:
         for (auto it = namedObjects.begin(); it != namedObjects.end(); ++it) {
             if (!py::isinstance(it->first, preserved_->pystr_) && !py::isinstance(it->first, preserved_->pybytes_)) { throw std::runtime_error("non-string key in upload dictionary is not allowed"); }
             names.push_back(it->first.cast<std::string>());
-            objs.push_back(ddb::DdbPythonUtil::toDolphinDB(py::reinterpret_borrow<py::object>(it->second)));
+            objs.push_back(toDolphinDBFast(py::reinterpret_borrow<py::object>(it->second)));
+            compressPolicy_.apply(objs.back());
         }
         try {
-            auto addr = dbConnection_.upload(names, objs);
+            ddb::ConstantSP addr;
+            {
+                py::gil_scoped_release release;
+                ddb::LockGuard<ddb::Mutex> guard(&connectionMutex_);
+                addr = dbConnection_.upload(names, objs);
+            }
             if (addr == NULL || addr->getType() == ddb::DT_VOID ||addr->isNothing()) {
                 return py::int_(-1);
             } else if(addr->isScalar()){
@@ -340,11 +1137,43 @@ public:
         } CATCH_EXCEPTION("<Exception> in upload: ")
     }
 
+    // Upload a table assembled from a list of columns (numpy or pyarrow arrays) as name.
+    py::object uploadColumns(const std::string &name, const py::list &names, const py::list &columns) {
+        if (names.size() != columns.size()) {
+            throw std::runtime_error("<Exception> in uploadColumns: the number of names and columns must be the same");
+        }
+        try {
+            vector<std::string> colNames;
+            vector<ddb::ConstantSP> cols;
+            for (size_t i = 0; i < columns.size(); ++i) {
+                py::object column = columns[i];
+                ddb::ConstantSP col = columnToDolphinDBFast(column);
+                if (col.isNull()) {
+                    col = ddb::DdbPythonUtil::toDolphinDB(column);
+                }
+                colNames.push_back(names[i].cast<std::string>());
+                cols.push_back(col);
+            }
+            vector<std::string> uploadNames{name};
+            vector<ddb::ConstantSP> objs{ddb::Util::createTable(colNames, cols)};
+            compressPolicy_.apply(objs[0]);
+            ddb::ConstantSP addr;
+            {
+                py::gil_scoped_release release;
+                ddb::LockGuard<ddb::Mutex> guard(&connectionMutex_);
+                addr = dbConnection_.upload(uploadNames, objs);
+            }
+            if (addr == NULL || addr->getType() == ddb::DT_VOID || addr->isNothing()) {
+                return py::int_(-1);
+            }
+            return py::int_(addr->getLong());
+        } CATCH_EXCEPTION("<Exception> in uploadColumns: ")
+    }
+
     ddb::ConstantSP runcpp(const string &script) {
         ddb::ConstantSP result;
         try {
-            result = dbConnection_.run(script, 4, 2);
-            
+            result = withConnection([&](ddb::DBConnection &conn) { return conn.run(script, 4, 2); });
         } CATCH_EXCEPTION("<Exception> in runcpp: ")
         return result;
     }
@@ -352,8 +1181,7 @@ public:
     ddb::ConstantSP runcpp(const string &funcName, vector<ddb::ConstantSP> &args) {
         ddb::ConstantSP result;
         try {
-            result = dbConnection_.run(funcName, args);
-            
+            result = withConnection([&](ddb::DBConnection &conn) { return conn.run(funcName, args); });
         } CATCH_EXCEPTION("<Exception> in runcpp: ")
         return result;
     } 
@@ -405,10 +1233,19 @@ public:
                 }
             }
         });
+        resetStats();
         py::object result;
         try {
             //ddb::RecordTime::printAllTime();
-            result = dbConnection_.runPy(script, 4, 2);
+            if (enablePickle_) {
+                lockConnection();
+                Defer unlock([this](){ unlockConnection(); });
+                auto start = std::chrono::steady_clock::now();
+                result = dbConnection_.runPy(script, 4, 2);
+                lastStats_.runTime = elapsedSeconds(start);
+            } else {
+                result = toPythonTimed(runWithoutGIL(script, false));
+            }
             DLOG(ddb::RecordTime::printAllTime());
         } CATCH_EXCEPTION("<Exception> in run: ")
         return result;
@@ -462,6 +1299,7 @@ public:
             }
         });
         //ddb::RecordTime::printAllTime();
+        resetStats();
         py::object result;
         try {
             vector<ddb::ConstantSP> ddbArgs;
@@ -469,10 +1307,19 @@ public:
             for (py::handle one : args) {
                 py::object pyobj = py::reinterpret_borrow<py::object>(one);
                 ddb::ConstantSP pcp = ddb::DdbPythonUtil::toDolphinDB(pyobj);
+                compressPolicy_.apply(pcp);
                 ddbArgs.push_back(pcp);
                 index++;
             }
-            result = dbConnection_.runPy(funcName, ddbArgs);
+            if (enablePickle_) {
+                lockConnection();
+                Defer unlock([this](){ unlockConnection(); });
+                auto start = std::chrono::steady_clock::now();
+                result = dbConnection_.runPy(funcName, ddbArgs);
+                lastStats_.runTime = elapsedSeconds(start);
+            } else {
+                result = toPythonTimed(runWithoutGIL(funcName, ddbArgs, false));
+            }
             DLOG(ddb::RecordTime::printAllTime());
         } CATCH_EXCEPTION("<Exception> in run: ")
         return result;
@@ -533,10 +1380,20 @@ public:
         if(kwargs.contains("pickleTableToList")){
             pickleTableToList = kwargs["pickleTableToList"].cast<bool>();
         }
+        resetStats();
         py::object result;
         try {
             //ddb::RecordTime::printAllTime();
-            result = dbConnection_.runPy(script, 4, 2, 0, clearMemory, pickleTableToList);
+            // pickleTableToList is implemented by the conversion inside runPy
+            if (enablePickle_ || pickleTableToList) {
+                lockConnection();
+                Defer unlock([this](){ unlockConnection(); });
+                auto start = std::chrono::steady_clock::now();
+                result = dbConnection_.runPy(script, 4, 2, 0, clearMemory, pickleTableToList);
+                lastStats_.runTime = elapsedSeconds(start);
+            } else {
+                result = toPythonTimed(runWithoutGIL(script, clearMemory));
+            }
             DLOG(ddb::RecordTime::printAllTime());
         } CATCH_EXCEPTION("<Exception> in run: ")
         return result;
@@ -597,17 +1454,52 @@ public:
         if(kwargs.contains("pickleTableToList")){
             pickleTableToList = kwargs["pickleTableToList"].cast<bool>();
         }
+        resetStats();
         py::object result;
         //ddb::RecordTime::printAllTime();
         try {
             vector<ddb::ConstantSP> ddbArgs;
             for (auto it = args.begin(); it != args.end(); ++it) { ddbArgs.push_back(ddb::DdbPythonUtil::toDolphinDB(py::reinterpret_borrow<py::object>(*it))); }
-            result = dbConnection_.runPy(funcName, ddbArgs, 4, 2, 0, clearMemory,pickleTableToList);
+            for (auto &arg : ddbArgs) { compressPolicy_.apply(arg); }
+            // pickleTableToList is implemented by the conversion inside runPy
+            if (enablePickle_ || pickleTableToList) {
+                lockConnection();
+                Defer unlock([this](){ unlockConnection(); });
+                auto start = std::chrono::steady_clock::now();
+                result = dbConnection_.runPy(funcName, ddbArgs, 4, 2, 0, clearMemory,pickleTableToList);
+                lastStats_.runTime = elapsedSeconds(start);
+            } else {
+                result = toPythonTimed(runWithoutGIL(funcName, ddbArgs, clearMemory));
+            }
         } CATCH_EXCEPTION("<Exception> in run: ")
         DLOG(ddb::RecordTime::printAllTime());
         return result;
     }
 
+    py::dict runColumns(const string &script, const py::args &args, const py::kwargs &kwargs) {
+        bool clearMemory = false;
+        if(kwargs.contains("clearMemory")){
+            clearMemory = kwargs["clearMemory"].cast<bool>();
+        }
+        resetStats();
+        py::dict ret;
+        try {
+            ddb::ConstantSP result;
+            if (args.size() == 0) {
+                result = runWithoutGIL(script, clearMemory);
+            } else {
+                vector<ddb::ConstantSP> ddbArgs;
+                for (auto it = args.begin(); it != args.end(); ++it) { ddbArgs.push_back(ddb::DdbPythonUtil::toDolphinDB(py::reinterpret_borrow<py::object>(*it))); }
+                for (auto &arg : ddbArgs) { compressPolicy_.apply(arg); }
+                result = runWithoutGIL(script, ddbArgs, clearMemory);
+            }
+            auto start = std::chrono::steady_clock::now();
+            ret = exportColumns(result);
+            lastStats_.decodeTime = elapsedSeconds(start);
+        } CATCH_EXCEPTION("<Exception> in runColumns: ")
+        return ret;
+    }
+
     BlockReader runBlock(const string &script, const py::kwargs & kwargs) {
         int fetchSize = 0;
         bool clearMemory = false;
@@ -617,14 +1509,26 @@ public:
         if(kwargs.contains("fetchSize")){
             fetchSize = kwargs["fetchSize"].cast<int>();
         }
+        int prefetch = 0;
+        if(kwargs.contains("prefetch")){
+            prefetch = kwargs["prefetch"].cast<int>();
+        }
         if(fetchSize < 8192) {
             throw std::runtime_error(std::string("<Exception> in run: fectchSize must be greater than 8192"));
         }
+        if(prefetch < 0) {
+            throw std::runtime_error(std::string("<Exception> in run: prefetch must not be negative"));
+        }
+        resetStats();
         ddb::ConstantSP result;
         try {
+            py::gil_scoped_release release;
+            ddb::LockGuard<ddb::Mutex> guard(&connectionMutex_);
+            auto start = std::chrono::steady_clock::now();
             result = dbConnection_.run(script, 4, 2, fetchSize, clearMemory);
+            lastStats_.runTime = elapsedSeconds(start);
         } CATCH_EXCEPTION("<Exception> in runBlock: ")
-        BlockReader blockReader(result);
+        BlockReader blockReader(result, prefetch);
         return blockReader;
     }
 
@@ -824,15 +1728,95 @@ public:
             }
         }
     }
-    ddb::DBConnection& getConnection() {
-        return dbConnection_;
+    // Runs f(connection) with the connection mutex held. The connection is only reachable this way, so that calls
+    // from other threads cannot interleave on its socket. The GIL, if held, is released first, as in lockConnection.
+    template <typename F>
+    auto withConnection(F f) -> decltype(f(std::declval<ddb::DBConnection&>())) {
+        ddb::SmartPointer<py::gil_scoped_release> pgilRelease;
+        if(PyGILState_Check() == 1)
+            pgilRelease = new py::gil_scoped_release;
+        ddb::LockGuard<ddb::Mutex> guard(&connectionMutex_);
+        return f(dbConnection_);
+    }
+
+    // The connection mutex is always acquired with the GIL released: a thread holding it may wait for the GIL,
+    // so no thread may wait for it while holding the GIL.
+    void lockConnection() {
+        py::gil_scoped_release release;
+        connectionMutex_.lock();
+    }
+
+    void unlockConnection() {
+        connectionMutex_.unlock();
     }
     void printPerformance(){
         ddb::DLogger::Info(ddb::RecordTime::printAllTime());
     }
+
+    void setCompressThreshold(long long thresholdBytes) {
+        compressPolicy_.setThreshold(thresholdBytes);
+    }
+
+    py::dict getCompressStats() {
+        return compressPolicy_.getStats();
+    }
+
+    ddb::ConstantSP runConstant(const string &script) {
+        try {
+            return runWithoutGIL(script, false);
+        } CATCH_EXCEPTION("<Exception> in run: ")
+    }
+
+    // Timing of the last run made by the calling thread, in seconds. runTime covers the SDK run call from
+    // sending the request to the deserialized result; with pickle enabled it also includes the
+    // conversion to Python objects and decodeTime is None.
+    py::dict getLastStats() {
+        py::dict stats;
+        stats["runTime"] = py::float_(lastStats_.runTime);
+        if (lastStats_.decodeTime < 0) {
+            stats["decodeTime"] = py::none();
+        } else {
+            stats["decodeTime"] = py::float_(lastStats_.decodeTime);
+        }
+        return stats;
+    }
 private:
     using policy = void (*)(ddb::VectorSP);
 
+    ddb::ConstantSP runWithoutGIL(const string &script, bool clearMemory) {
+        py::gil_scoped_release release;
+        ddb::LockGuard<ddb::Mutex> guard(&connectionMutex_);
+        auto start = std::chrono::steady_clock::now();
+        ddb::ConstantSP result = dbConnection_.run(script, 4, 2, 0, clearMemory);
+        lastStats_.runTime = elapsedSeconds(start);
+        return result;
+    }
+
+    ddb::ConstantSP runWithoutGIL(const string &funcName, vector<ddb::ConstantSP> &args, bool clearMemory) {
+        py::gil_scoped_release release;
+        ddb::LockGuard<ddb::Mutex> guard(&connectionMutex_);
+        auto start = std::chrono::steady_clock::now();
+        ddb::ConstantSP result = dbConnection_.run(funcName, args, 4, 2, 0, clearMemory);
+        lastStats_.runTime = elapsedSeconds(start);
+        return result;
+    }
+
+    py::object toPythonTimed(const ddb::ConstantSP &obj) {
+        auto start = std::chrono::steady_clock::now();
+        py::object result = ddb::DdbPythonUtil::toPython(obj);
+        lastStats_.decodeTime = elapsedSeconds(start);
+        return result;
+    }
+
+    void resetStats() {
+        lastStats_.runTime = 0;
+        lastStats_.decodeTime = -1;
+    }
+
+    static double elapsedSeconds(std::chrono::steady_clock::time_point start) {
+        return std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+    }
+
 private:
     static bool isSigint_;
     static bool enableJobCancellation_;
@@ -863,8 +1847,21 @@ private:
     ddb::Mutex subscriberMutex_;
     std::vector<ddb::ThreadSP> gcThread_;
     int keepAliveTime_;
+    bool enablePickle_;
+    ddb::Mutex connectionMutex_;
+    CompressPolicy compressPolicy_;
+
+    // Kept per thread rather than per session: several threads may run on one session, and each reads
+    // the timing of its own call right after it returns.
+    struct RunStats {
+        double runTime = 0;
+        double decodeTime = -1;
+    };
+    static thread_local RunStats lastStats_;
 };
 
+thread_local SessionImpl::RunStats SessionImpl::lastStats_;
+
 bool SessionImpl::isSigint_ = false;
 bool SessionImpl::enableJobCancellation_ = false;
 sighandler_t SessionImpl::sighandler_ = nullptr;
@@ -878,16 +1875,7 @@ void signal_handler_fun(int signum) {
         SessionImpl::isSigint_ = true;
 
         for (auto &item : SessionImpl::runningMap_) {
-            SessionImpl *session = new SessionImpl(false, false, 7200, false, true, false);
-            session->connect(item.first->host_, item.first->port_, item.first->userId_, item.first->password_);
-            string id = item.first->getSessionId();
-            ddb::ConstantSP jobs = session->runcpp("string(exec rootJobId from getConsoleJobs() where sessionId = "+ id + ")");
-            if(jobs->isVector() && jobs->size() > 0 ) {
-                vector<ddb::ConstantSP> args;
-                args.emplace_back(jobs);
-                ddb::ConstantSP res = session->runcpp("cancelConsoleJob", args);
-            }
-            delete session;
+            item.first->cancelRunningJobs();
         }
 
 
@@ -905,41 +1893,258 @@ ddb::SmartPointer<ddb::StreamDeserializer> StreamDeserializer::get(){
         if(sessionImpl_==nullptr)
             streamDeserializer_ = new ddb::StreamDeserializer(sym2tableName_);
         else
-            streamDeserializer_ = new ddb::StreamDeserializer(sym2tableName_,&sessionImpl_->getConnection());
+            // the deserializer loads the schemas of the tables over the connection when it is created
+            streamDeserializer_ = sessionImpl_->withConnection([this](ddb::DBConnection &conn) {
+                return ddb::SmartPointer<ddb::StreamDeserializer>(new ddb::StreamDeserializer(sym2tableName_, &conn));
+            });
     }
     return streamDeserializer_;
 }
 
+// Conversion plan of the DataFrames appended to a table with a known schema. For each column of the schema, the plan
+// records the DataFrame column of the same name, its dtype and how it is converted to the schema type. It is compiled
+// on the first append and recompiled only when the DataFrame columns change; a column whose dtype changes is replanned
+// on its own. Planned columns are encoded straight from their buffers, only the others go through the generic
+// DdbPythonUtil::toDolphinDB inference.
+class ConversionPlan {
+public:
+    ConversionPlan(SessionImpl &session, const std::string &dbUrl, const std::string &tableName) {
+        std::string table = dbUrl.empty() ? tableName : "loadTable(\"" + dbUrl + "\",\"" + tableName + "\")";
+        ddb::TableSP colDefs = session.runConstant("schema(" + table + ").colDefs");
+        ddb::VectorSP names = colDefs->getColumn("name");
+        ddb::VectorSP types = colDefs->getColumn("typeInt");
+        for (int i = 0; i < colDefs->rows(); ++i) {
+            names_.push_back(names->getString(i));
+            types_.push_back((ddb::DATA_TYPE)types->getInt(i));
+        }
+    }
+
+    // Converts df to a table with the column names and order of the schema, the DataFrame columns being matched by
+    // name. Returns a null pointer if a schema column has no DataFrame column of the same name. exact is set when
+    // every column already has its schema type, or one the server converts on insert (STRING into SYMBOL).
+    ddb::TableSP convert(const py::object &df, bool &exact) {
+        py::object columns = df.attr("columns");
+        if (!compiled_ || !columns.attr("equals")(columns_).cast<bool>()) {
+            compile(columns);
+        }
+        if (!usable_) {
+            return nullptr;
+        }
+        vector<ddb::ConstantSP> cols(steps_.size());
+        py::list rest;
+        vector<size_t> restPos;
+        for (size_t i = 0; i < steps_.size(); ++i) {
+            Step &step = steps_[i];
+            py::object col = df.attr("__getitem__")(step.source);
+            py::object dtype = col.attr("dtype");
+            if (!dtype.equal(step.dtype)) {
+                step.dtype = dtype;
+                step.kind = kindOf(dtype, types_[i]);
+            }
+            cols[i] = convertColumn(step.kind, col, types_[i]);
+            if (cols[i].isNull()) {
+                rest.append(step.source);
+                restPos.push_back(i);
+            }
+        }
+        if (!restPos.empty()) {
+            ddb::TableSP restTable = ddb::DdbPythonUtil::toDolphinDB(df.attr("__getitem__")(rest));
+            for (size_t j = 0; j < restPos.size(); ++j) {
+                cols[restPos[j]] = restTable->getColumn((int)j);
+            }
+        }
+        exact = true;
+        for (size_t i = 0; i < cols.size(); ++i) {
+            ddb::DATA_TYPE type = cols[i]->getType();
+            if (type != types_[i] && ddb::Util::getCategory(type) == ddb::TEMPORAL && ddb::Util::getCategory(types_[i]) == ddb::TEMPORAL) {
+                cols[i] = cols[i]->castTemporal(types_[i]);
+                type = cols[i]->getType();
+            }
+            if (type != types_[i] && !(type == ddb::DT_STRING && types_[i] == ddb::DT_SYMBOL)) {
+                exact = false;
+            }
+        }
+        return ddb::Util::createTable(names_, cols);
+    }
+
+private:
+    enum Kind { GENERIC, STRING, CATEGORICAL, TEMPORAL, NUMERIC };
+
+    struct Step {
+        py::object source;
+        py::object dtype;
+        Kind kind;
+    };
+
+    void compile(const py::object &columns) {
+        compiled_ = true;
+        columns_ = columns;
+        steps_.clear();
+        usable_ = columns.attr("is_unique").cast<bool>();
+        if (!usable_) {
+            return;
+        }
+        // DolphinDB column names are case-insensitive
+        std::unordered_map<std::string, py::object> byName;
+        for (py::handle label : columns) {
+            byName[lower(py::str(label))] = py::reinterpret_borrow<py::object>(label);
+        }
+        for (const std::string &name : names_) {
+            auto it = byName.find(lower(name));
+            if (it == byName.end()) {
+                usable_ = false;
+                steps_.clear();
+                return;
+            }
+            steps_.push_back(Step{it->second, py::none(), GENERIC});
+        }
+    }
+
+    static std::string lower(std::string s) {
+        std::transform(s.begin(), s.end(), s.begin(), ::tolower);
+        return s;
+    }
+
+    static Kind kindOf(const py::object &dtype, ddb::DATA_TYPE type) {
+        std::string name = py::str(dtype);
+        if (name == "category") {
+            return ddb::Util::getCategory(type) == ddb::LITERAL ? CATEGORICAL : GENERIC;
+        }
+        if (name == "object" || name.rfind("string", 0) == 0) {
+            return ddb::Util::getCategory(type) == ddb::LITERAL ? STRING : GENERIC;
+        }
+        if (name == "datetime64[ns]") {
+            return ddb::Util::getCategory(type) == ddb::TEMPORAL ? TEMPORAL : GENERIC;
+        }
+        static const std::unordered_map<std::string, ddb::DATA_TYPE> numeric = {
+            {"bool", ddb::DT_BOOL}, {"int8", ddb::DT_CHAR}, {"int16", ddb::DT_SHORT}, {"int32", ddb::DT_INT},
+            {"int64", ddb::DT_LONG}, {"float32", ddb::DT_FLOAT}, {"float64", ddb::DT_DOUBLE}};
+        auto it = numeric.find(name);
+        return it != numeric.end() && it->second == type ? NUMERIC : GENERIC;
+    }
+
+    // Returns a null pointer for the columns left to the generic conversion.
+    static ddb::ConstantSP convertColumn(Kind kind, const py::object &col, ddb::DATA_TYPE type) {
+        switch (kind) {
+        case STRING:
+        case CATEGORICAL:
+            return columnToDolphinDBFast(col);
+        case TEMPORAL: {
+            // NaT is INT64_MIN, which is also the null of NANOTIMESTAMP
+            ddb::VectorSP vec = numericVector<long long>(ddb::DT_NANOTIMESTAMP, col.attr("to_numpy")().attr("view")("int64"));
+            return type == ddb::DT_NANOTIMESTAMP ? ddb::ConstantSP(vec) : vec->castTemporal(type);
+        }
+        case NUMERIC:
+            switch (type) {
+            case ddb::DT_BOOL: return numericVector<bool>(type, col.attr("to_numpy")());
+            case ddb::DT_CHAR: return numericVector<int8_t>(type, col.attr("to_numpy")());
+            case ddb::DT_SHORT: return numericVector<short>(type, col.attr("to_numpy")());
+            case ddb::DT_INT: return numericVector<int>(type, col.attr("to_numpy")());
+            case ddb::DT_LONG: return numericVector<long long>(type, col.attr("to_numpy")());
+            case ddb::DT_FLOAT: return numericVector<float>(type, col.attr("to_numpy")());
+            case ddb::DT_DOUBLE: return numericVector<double>(type, col.attr("to_numpy")());
+            default: return nullptr;
+            }
+        default:
+            return nullptr;
+        }
+    }
+
+    // Copies the buffer of a numpy array of the same width into a vector of the given type, NaN becoming null.
+    template <typename T>
+    static ddb::VectorSP numericVector(ddb::DATA_TYPE type, const py::object &values) {
+        auto arr = py::array_t<T, py::array::c_style | py::array::forcecast>::ensure(values);
+        if (!arr) {
+            throw std::runtime_error("<Exception> in append: cannot read the buffer of a column");
+        }
+        int size = (int)arr.size();
+        ddb::VectorSP vec = ddb::Util::createVector(type, 0, size);
+        T *data = const_cast<T*>(arr.data());
+        switch (type) {
+        case ddb::DT_BOOL: vec->appendBool((char*)data, size); break;
+        case ddb::DT_CHAR: vec->appendChar((char*)data, size); break;
+        case ddb::DT_SHORT: vec->appendShort((short*)data, size); break;
+        case ddb::DT_INT: vec->appendInt((int*)data, size); break;
+        case ddb::DT_FLOAT: vec->appendFloat((float*)data, size); break;
+        case ddb::DT_DOUBLE: vec->appendDouble((double*)data, size); break;
+        default: vec->appendLong((long long*)data, size); break;
+        }
+        if (std::is_floating_point<T>::value) {
+            for (int i = 0; i < size; ++i) {
+                if (std::isnan((double)data[i])) {
+                    vec->setNull(i);
+                }
+            }
+        }
+        return vec;
+    }
+
+    vector<std::string> names_;
+    vector<ddb::DATA_TYPE> types_;
+    vector<Step> steps_;
+    py::object columns_;
+    bool compiled_ = false;
+    bool usable_ = false;
+};
+
 class AutoFitTableAppender{
 public:
     AutoFitTableAppender(const std::string dbUrl, const std::string tableName, SessionImpl & session)
-    : autoFitTableAppender_(dbUrl,tableName,session.getConnection()){}
+    : dbUrl_(dbUrl), tableName_(tableName), session_(session), plan_(session, dbUrl, tableName){
+        table_ = dbUrl.empty() ? tableName : "loadTable(\"" + dbUrl + "\",\"" + tableName + "\")";
+    }
     int append(py::object table){
         if(!py::isinstance(table, preserved_->pddataframe_))
             throw std::runtime_error(std::string("table must be a DataFrame!"));
         int insertRows;
         try {
-            insertRows = autoFitTableAppender_.append(ddb::DdbPythonUtil::toDolphinDB(table));
+            bool exact = false;
+            ddb::TableSP data = plan_.convert(table, exact);
+            if (!data.isNull() && exact) {
+                // the columns already have the schema types, so the casts of the SDK appender are not needed
+                vector<ddb::ConstantSP> args{data};
+                return session_.runcpp("tableInsert{" + table_ + "}", args)->getInt();
+            }
+            ddb::ConstantSP converted = data.isNull() ? toDolphinDBFast(table) : ddb::ConstantSP(data);
+            insertRows = session_.withConnection([&](ddb::DBConnection &conn) {
+                // created on the first frame that needs its casts; it reads the schema again
+                if (autoFitTableAppender_ == nullptr)
+                    autoFitTableAppender_.reset(new ddb::AutoFitTableAppender(dbUrl_, tableName_, conn));
+                return autoFitTableAppender_->append(converted);
+            });
         } CATCH_EXCEPTION("<Exception> in append: ")
         return insertRows;
     }
 private:
-    ddb::AutoFitTableAppender autoFitTableAppender_;
+    std::string dbUrl_;
+    std::string tableName_;
+    std::string table_;
+    std::unique_ptr<ddb::AutoFitTableAppender> autoFitTableAppender_;
+    SessionImpl &session_;
+    ConversionPlan plan_;
 };
 
 class AutoFitTableUpsert{
 public:
     AutoFitTableUpsert(const std::string dbUrl, const std::string tableName, SessionImpl & session,
                 bool ignoreNull = false, const py::list& keyColNames = py::list(0), const py::list& sortColumns = py::list(0))
-            : autoFitTableUpsert(dbUrl,tableName,session.getConnection(),ignoreNull,
-                        pylist2Stringvector(keyColNames).get(),
-                        pylist2Stringvector(sortColumns).get()){}
+            : session_(session), plan_(session, dbUrl, tableName){
+        std::unique_ptr<vector<string>> keyCols = pylist2Stringvector(keyColNames);
+        std::unique_ptr<vector<string>> sortCols = pylist2Stringvector(sortColumns);
+        // the upserter queries the schema of the table over the connection when it is created
+        autoFitTableUpsert.reset(session.withConnection([&](ddb::DBConnection &conn) {
+            return new ddb::AutoFitTableUpsert(dbUrl, tableName, conn, ignoreNull, keyCols.get(), sortCols.get());
+        }));
+    }
     int upsert(py::object table){
         if(!py::isinstance(table, preserved_->pddataframe_))
             throw std::runtime_error(std::string("table must be a DataFrame!"));
         int insertRows = 0;
         try {
-            insertRows = autoFitTableUpsert.upsert(ddb::DdbPythonUtil::toDolphinDB(table));
+            bool exact = false;
+            ddb::TableSP data = plan_.convert(table, exact);
+            ddb::ConstantSP converted = data.isNull() ? toDolphinDBFast(table) : ddb::ConstantSP(data);
+            insertRows = session_.withConnection([&](ddb::DBConnection &) { return autoFitTableUpsert->upsert(converted); });
         } CATCH_EXCEPTION("<Exception> in append: ")
         return insertRows;
     }
@@ -949,7 +2154,9 @@ private:
         for (py::handle o : pylist) { psites->emplace_back(py::cast<std::string>(o)); }
         return psites;
     }
-    ddb::AutoFitTableUpsert autoFitTableUpsert;
+    std::unique_ptr<ddb::AutoFitTableUpsert> autoFitTableUpsert;
+    SessionImpl &session_;
+    ConversionPlan plan_;
 };
 
 class BatchTableWriter{
@@ -1201,8 +2408,12 @@ PYBIND11_MODULE(dolphindbcpp, m) {
         .def("run", (py::object(DBConnectionPoolImpl::*)(const std::string &, int, const py::args &, const py::kwargs &)) & DBConnectionPoolImpl::run)
         .def("isFinished",(bool(DBConnectionPoolImpl::*)(int)) & DBConnectionPoolImpl::isFinished)
         .def("getData",(py::object(DBConnectionPoolImpl::*)(int)) & DBConnectionPoolImpl::getData)
+        .def("watch",&DBConnectionPoolImpl::watch)
+        .def("runBatch",&DBConnectionPoolImpl::runBatch)
         .def("shutDown",&DBConnectionPoolImpl::shutDown)
-        .def("getSessionId",&DBConnectionPoolImpl::getSessionId);
+        .def("getSessionId",&DBConnectionPoolImpl::getSessionId)
+        .def("setCompressThreshold",&DBConnectionPoolImpl::setCompressThreshold)
+        .def("getCompressStats",&DBConnectionPoolImpl::getCompressStats);
 
     py::class_<SessionImpl>(m, "sessionimpl")
         .def(py::init<bool,bool,int,bool,bool,bool>())
@@ -1217,7 +2428,10 @@ PYBIND11_MODULE(dolphindbcpp, m) {
         .def("run", (py::object(SessionImpl::*)(const std::string &, const py::kwargs &)) & SessionImpl::run)
         .def("run", (py::object(SessionImpl::*)(const std::string &, const py::args &, const py::kwargs &)) & SessionImpl::run)
         .def("runBlock",&SessionImpl::runBlock)
+        .def("cancelJobs",&SessionImpl::cancelJobs)
+        .def("runColumns",&SessionImpl::runColumns)
         .def("upload", &SessionImpl::upload)
+        .def("uploadColumns", &SessionImpl::uploadColumns)
         .def("nullValueToZero", &SessionImpl::nullValueToZero)
         .def("nullValueToNan", &SessionImpl::nullValueToNan)
         .def("enableStreaming", &SessionImpl::enableStreaming)
@@ -1229,6 +2443,9 @@ PYBIND11_MODULE(dolphindbcpp, m) {
         .def("hashBucket", &SessionImpl::hashBucket)
         .def("getSubscriptionTopics", &SessionImpl::getSubscriptionTopics)
         .def("printPerformance", &SessionImpl::printPerformance)
+        .def("getLastStats", &SessionImpl::getLastStats)
+        .def("setCompressThreshold", &SessionImpl::setCompressThreshold)
+        .def("getCompressStats", &SessionImpl::getCompressStats)
         .def("loadPickleFile", &SessionImpl::loadPickleFile);
     
     py::class_<StreamDeserializer>(m, "streamDeserializer")
@@ -1236,9 +2453,13 @@ PYBIND11_MODULE(dolphindbcpp, m) {
         .def("setSession", &StreamDeserializer::setSession);
 
     py::class_<BlockReader>(m, "blockReader")
-        .def(py::init<ddb::BlockReaderSP>())
+        .def(py::init<ddb::BlockReaderSP, int>(), py::arg("reader"), py::arg("prefetch") = 0)
         .def("read", (py::object(BlockReader::*)()) &BlockReader::read)
         .def("skipAll", &BlockReader::skipAll)
+        .def("cancel", &BlockReader::cancel)
+        .def("waitStopped", &BlockReader::waitStopped)
+        .def("lastTypes", &BlockReader::lastTypes)
+        .def("lastSeconds", &BlockReader::lastSeconds)
         .def("hasNext", (py::bool_(BlockReader::*)())&BlockReader::hasNext);
 
     py::class_<PartitionedTableAppender>(m, "partitionedTableAppender")
@@ -0,0 +1,133 @@
+"""Cache
+Package: client-side cache of query results used by session.enableResultCache.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+import copy
+import re
+import sys
+import time
+import numpy as np
+from pandas import DataFrame, Series
+
+
+_LITERAL_OR_SPACE = re.compile(r'("(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\')|\s+')
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+def _normalize_script(script):
+    """Collapse whitespace outside string literals so that equivalent scripts share a key."""
+    return _LITERAL_OR_SPACE.sub(lambda m: m.group(1) or " ", script).strip()
+
+
+def _sizeof(obj):
+    """Size in bytes of a result, counting the elements of containers and object arrays."""
+    if isinstance(obj, (DataFrame, Series)):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, np.ndarray):
+        if obj.dtype == object:
+            return int(obj.nbytes) + sum(_sizeof(x) for x in obj.flat)
+        return int(obj.nbytes)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(_sizeof(k) + _sizeof(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(_sizeof(x) for x in obj)
+    return sys.getsizeof(obj)
+
+
+def _copy(obj):
+    """Copy of a result that shares no mutable part with it."""
+    if isinstance(obj, (DataFrame, Series)):
+        return obj.copy(deep=True)
+    if isinstance(obj, np.ndarray) and obj.dtype != object:
+        return obj.copy()
+    if isinstance(obj, (np.ndarray, dict, list, tuple, set)):
+        return copy.deepcopy(obj)
+    return obj
+
+
+class ResultCache(object):
+    """LRU cache of query results bounded in bytes, with a time to live for each entry.
+
+    Args:
+        maxBytes : the maximum total size of the cached results in bytes.
+        ttl : the number of seconds an entry stays valid. Defaults to None, meaning entries only expire by eviction or invalidation.
+
+    Note:
+        Every entry records the identifiers used in its script, so that invalidate(tableName) drops all results that read the table.
+        Results are stored and returned as copies, so the caller can modify the returned object.
+    """
+    def __init__(self, maxBytes:int, ttl:float=None):
+        """Constructor of ResultCache."""
+        if maxBytes <= 0:
+            raise ValueError("maxBytes must be greater than 0")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be greater than 0")
+        self.__maxBytes = maxBytes
+        self.__ttl = ttl
+        self.__entries = OrderedDict()  # key -> (result, size, expireTime, identifiers)
+        self.__size = 0
+        self.__lock = Lock()
+
+    @staticmethod
+    def makeKey(script:str, kwargs:dict):
+        """Build the cache key of a script executed with the given keyword arguments."""
+        return (_normalize_script(script), tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+
+    def get(self, key):
+        """Look up a result.
+
+        Returns:
+            a tuple (hit, result). result is None when hit is False.
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                return False, None
+            if entry[2] is not None and entry[2] <= time.monotonic():
+                self.__remove(key)
+                return False, None
+            self.__entries.move_to_end(key)
+            return True, _copy(entry[0])
+
+    def put(self, key, result, tags=()) -> None:
+        """Store a result, evicting the least recently used entries if the cache exceeds maxBytes.
+
+        A result larger than maxBytes is not cached. tags are names, besides the identifiers of the script, under which invalidate drops the result.
+        """
+        size = _sizeof(result)
+        if size > self.__maxBytes:
+            return
+        expireTime = None if self.__ttl is None else time.monotonic() + self.__ttl
+        identifiers = frozenset(_IDENTIFIER.findall(key[0])).union(tags)
+        with self.__lock:
+            if key in self.__entries:
+                self.__remove(key)
+            self.__entries[key] = (_copy(result), size, expireTime, identifiers)
+            self.__size += size
+            while self.__size > self.__maxBytes:
+                self.__remove(next(iter(self.__entries)))
+
+    def invalidate(self, tableName:str) -> None:
+        """Drop all cached results whose script references tableName."""
+        with self.__lock:
+            for key in [k for k, v in self.__entries.items() if tableName in v[3]]:
+                self.__remove(key)
+
+    def clear(self) -> None:
+        """Drop all cached results."""
+        with self.__lock:
+            self.__entries.clear()
+            self.__size = 0
+
+    def size(self) -> int:
+        """Return the total size of the cached results in bytes."""
+        return self.__size
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __remove(self, key):
+        entry = self.__entries.pop(key)
+        self.__size -= entry[1]
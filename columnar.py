@@ -0,0 +1,426 @@
+"""Columnar
+Package: builds Arrow tables and zero-copy DataFrames from the column buffers returned by sessionimpl.runColumns,
+        reads the column chunks of files sent by session.uploadFile, and writes blocks of BlockReader to local files.
+"""
+
+import numpy as np
+import pandas as pd
+from dolphindb.settings import *
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("pyarrow is required for Arrow output. Please install it with: pip install pyarrow")
+    return pa
+
+
+_MONTH_EPOCH = 1970 * 12
+
+
+def _null_mask(values, ddbType, hasNull):
+    """Return a boolean mask of the null sentinels in values, or None if there is no null."""
+    if not hasNull or ddbType not in DBNAN:
+        return None
+    return values == DBNAN[ddbType]
+
+
+def _validity_buffer(pa, mask):
+    return pa.py_buffer(np.packbits(~mask, bitorder="little"))
+
+
+def _from_buffer(pa, arrowType, values, mask):
+    """Build an Arrow array over the buffer of values. The data buffer is not copied."""
+    validity = None
+    nullCount = 0
+    if mask is not None:
+        nullCount = int(mask.sum())
+        if nullCount:
+            validity = _validity_buffer(pa, mask)
+    return pa.Array.from_buffers(arrowType, len(values), [validity, pa.py_buffer(values)], null_count=nullCount)
+
+
+def _arrow_column(pa, ddbType, values, hasNull):
+    """Convert one column returned by runColumns to an Arrow array.
+
+    Args:
+        pa : the pyarrow module.
+        ddbType : DolphinDB data type of the column.
+        values : numpy array of raw values for fixed-width types, converted values otherwise.
+        hasNull : whether the column contains null values.
+
+    Returns:
+        pyarrow.Array.
+
+    Note:
+        Numeric columns and DATE, SECOND, TIME, TIMESTAMP, NANOTIME and NANOTIMESTAMP columns share the received buffer.
+        MONTH, MINUTE, DATETIME and DATEHOUR have no Arrow type with the same unit and width and are converted.
+    """
+    if ddbType in (DT_BYTE, DT_SHORT, DT_INT, DT_LONG, DT_FLOAT, DT_DOUBLE):
+        mask = _null_mask(values, ddbType, hasNull)
+        return _from_buffer(pa, pa.from_numpy_dtype(values.dtype), values, mask)
+    if ddbType == DT_BOOL:
+        mask = _null_mask(values, ddbType, hasNull)
+        return pa.array(values != 0, type=pa.bool_(), mask=mask)
+    if ddbType == DT_DATE:
+        return _from_buffer(pa, pa.date32(), values, _null_mask(values, ddbType, hasNull))
+    if ddbType == DT_SECOND:
+        return _from_buffer(pa, pa.time32("s"), values, _null_mask(values, ddbType, hasNull))
+    if ddbType == DT_TIME:
+        return _from_buffer(pa, pa.time32("ms"), values, _null_mask(values, ddbType, hasNull))
+    if ddbType == DT_TIMESTAMP:
+        return _from_buffer(pa, pa.timestamp("ms"), values, _null_mask(values, ddbType, hasNull))
+    if ddbType == DT_NANOTIME:
+        return _from_buffer(pa, pa.time64("ns"), values, _null_mask(values, ddbType, hasNull))
+    if ddbType == DT_NANOTIMESTAMP:
+        return _from_buffer(pa, pa.timestamp("ns"), values, _null_mask(values, ddbType, hasNull))
+    if ddbType == DT_MONTH:
+        mask = _null_mask(values, ddbType, hasNull)
+        days = (values - _MONTH_EPOCH).astype("datetime64[M]").astype("datetime64[D]").astype(np.int32)
+        return _from_buffer(pa, pa.date32(), days, mask)
+    if ddbType == DT_MINUTE:
+        mask = _null_mask(values, ddbType, hasNull)
+        return _from_buffer(pa, pa.time32("s"), values * 60, mask)
+    if ddbType == DT_DATETIME:
+        mask = _null_mask(values, ddbType, hasNull)
+        return _from_buffer(pa, pa.timestamp("s"), values.astype(np.int64), mask)
+    if ddbType == DT_DATEHOUR:
+        mask = _null_mask(values, ddbType, hasNull)
+        return _from_buffer(pa, pa.timestamp("s"), values.astype(np.int64) * 3600, mask)
+    if ddbType == DT_SYMBOL:
+        return pa.array(values, type=pa.string()).dictionary_encode()
+    if ddbType == DT_STRING:
+        return pa.array(values, type=pa.string())
+    return pa.array(values)
+
+
+def _columns_to_arrow(res):
+    """Build a pyarrow.Table from the result of sessionimpl.runColumns.
+
+    A vector is returned as a single-column table. Other data forms are returned as converted by the default path.
+    """
+    if "raw" in res:
+        return res["raw"]
+    pa = _import_pyarrow()
+    arrays = []
+    for ddbType, values, hasNull in zip(res["types"], res["columns"], res["hasNull"]):
+        arrays.append(_arrow_column(pa, ddbType, values, hasNull))
+    return pa.Table.from_arrays(arrays, names=list(res["names"]))
+
+
+# datetime64[ns] is the unit of the default conversion, so only nanosecond columns can be views
+_DATETIME64_VIEWS = {
+    DT_NANOTIMESTAMP: "datetime64[ns]",
+    DT_NANOTIME: "datetime64[ns]",
+}
+
+_DATETIME64_UNITS = {
+    DT_DATE: "datetime64[D]",
+    DT_MONTH: "datetime64[M]",
+    DT_TIME: "datetime64[ms]",
+    DT_TIMESTAMP: "datetime64[ms]",
+    DT_MINUTE: "datetime64[m]",
+    DT_SECOND: "datetime64[s]",
+    DT_DATETIME: "datetime64[s]",
+    DT_DATEHOUR: "datetime64[h]",
+}
+
+
+def _numpy_column(ddbType, values, hasNull):
+    """Convert one column returned by runColumns to a numpy array, sharing the received buffer where possible.
+
+    Args:
+        ddbType : DolphinDB data type of the column.
+        values : numpy array of raw values for fixed-width types, converted values otherwise.
+        hasNull : whether the column contains null values.
+
+    Returns:
+        numpy array.
+
+    Note:
+        The following columns are views of the received buffer: FLOAT and DOUBLE (nulls are overwritten with NaN in place),
+        NANOTIME and NANOTIMESTAMP (the null sentinel is NaT), and integral or BOOL columns without nulls.
+        Integral columns with nulls are converted to float64 and the other temporal columns, including TIMESTAMP, to datetime64[ns], as in the default path.
+    """
+    if not isinstance(values, np.ndarray) or ddbType not in DATA_SIZE or values.dtype == np.object_:
+        return values
+    if ddbType in (DT_FLOAT, DT_DOUBLE):
+        if hasNull:
+            values[values == DBNAN[ddbType]] = np.nan
+        return values
+    if ddbType in _DATETIME64_VIEWS:
+        return values.view(_DATETIME64_VIEWS[ddbType])
+    mask = _null_mask(values, ddbType, hasNull)
+    if ddbType in _DATETIME64_UNITS:
+        if ddbType == DT_MONTH:
+            values = values - _MONTH_EPOCH
+        res = values.astype(_DATETIME64_UNITS[ddbType]).astype("datetime64[ns]")
+        if mask is not None:
+            res[mask] = np.datetime64("NaT")
+        return res
+    if ddbType == DT_BOOL:
+        if mask is None:
+            return values.view(np.bool_)
+        res = (values != 0).astype(np.object_)
+        res[mask] = None
+        return res
+    if mask is None:
+        return values
+    res = values.astype(np.float64)
+    res[mask] = np.nan
+    return res
+
+
+def _columns_to_dataframe(res):
+    """Build a DataFrame (or a numpy array for a vector) from the result of sessionimpl.runColumns without copying the column buffers.
+
+    Other data forms are returned as converted by the default path.
+    """
+    if "raw" in res:
+        return res["raw"]
+    columns = [_numpy_column(ddbType, values, hasNull) for ddbType, values, hasNull in zip(res["types"], res["columns"], res["hasNull"])]
+    if res["form"] == DF_VECTOR:
+        return columns[0]
+    df = pd.DataFrame(dict(enumerate(columns)), copy=False)
+    df.columns = list(res["names"])
+    return df
+
+
+def _decode_into(name, ddbType, values, hasNull, dst):
+    """Copy one column returned by runColumns into the caller-provided array dst and return the view of dst holding it."""
+    n = len(values)
+    if not isinstance(dst, np.ndarray) or dst.ndim != 1:
+        raise ValueError("The output buffer of column '{}' must be a 1-dimensional numpy array.".format(name))
+    if len(dst) < n:
+        raise ValueError("The output buffer of column '{}' holds {} rows, but the result has {} rows.".format(name, len(dst), n))
+    target = dst[:n]
+    if not isinstance(values, np.ndarray) or values.dtype == np.object_ or ddbType not in DATA_SIZE:
+        target[...] = values
+        return target
+    mask = None
+    if ddbType in _DATETIME64_VIEWS:
+        src = values.view(_DATETIME64_VIEWS[ddbType])
+    else:
+        mask = _null_mask(values, ddbType, hasNull)
+        if ddbType in _DATETIME64_UNITS:
+            src = (values - _MONTH_EPOCH) if ddbType == DT_MONTH else values
+            src = src.astype(_DATETIME64_UNITS[ddbType])
+        elif ddbType == DT_BOOL:
+            src = values.view(np.bool_) if mask is None else values != 0
+        else:
+            src = values
+    np.copyto(target, src, casting="same_kind")
+    if mask is not None and mask.any():
+        if target.dtype.kind == "f":
+            target[mask] = np.nan
+        elif target.dtype.kind in "mM":
+            target[mask] = np.datetime64("NaT")
+        elif target.dtype.kind == "O":
+            target[mask] = None
+        else:
+            raise ValueError("Column '{}' contains null values, which cannot be stored in an output buffer of dtype {}.".format(name, target.dtype))
+    return target
+
+
+def _columns_into(res, out):
+    """Decode the result of sessionimpl.runColumns into caller-provided arrays.
+
+    Args:
+        res : the result of runColumns.
+        out : a numpy array for a vector result, or a dict of column name to numpy array for a table result.
+
+    Returns:
+        a view of out holding a vector result, or a DataFrame whose columns are views of the arrays in out.
+        Table columns missing from out are converted as with zeroCopy=True.
+    """
+    if "raw" in res:
+        raise ValueError("out only supports table or vector results.")
+    if res["form"] == DF_VECTOR:
+        if isinstance(out, dict):
+            raise ValueError("out must be a numpy array for a vector result.")
+        return _decode_into(res["names"][0], res["types"][0], res["columns"][0], res["hasNull"][0], out)
+    if not isinstance(out, dict):
+        raise ValueError("out must be a dict of column name to numpy array for a table result.")
+    columns = []
+    for name, ddbType, values, hasNull in zip(res["names"], res["types"], res["columns"], res["hasNull"]):
+        if name in out:
+            columns.append(_decode_into(name, ddbType, values, hasNull, out[name]))
+        else:
+            columns.append(_numpy_column(ddbType, values, hasNull))
+    df = pd.DataFrame(dict(enumerate(columns)), copy=False)
+    df.columns = list(res["names"])
+    return df
+
+
+def _arrow_column_for_upload(pa, col):
+    """Prepare a column of a record batch for sessionimpl.uploadColumns.
+
+    String columns are passed as Arrow arrays and encoded from their buffers. The others are passed as numpy arrays,
+    with the nulls of signed integer columns filled with the DolphinDB null value so that the type is kept.
+    """
+    if pa.types.is_dictionary(col.type):
+        col = col.dictionary_decode()
+    if pa.types.is_string(col.type) or pa.types.is_large_string(col.type):
+        return col
+    if pa.types.is_signed_integer(col.type) and col.null_count:
+        import pyarrow.compute as pc
+        col = pc.fill_null(col, np.iinfo(col.type.to_pandas_dtype()).min)
+    return col.to_numpy(zero_copy_only=False)
+
+
+def _arrow_batch_columns(pa, batch):
+    return list(batch.schema.names), [_arrow_column_for_upload(pa, col) for col in batch.columns]
+
+
+def _arrow_empty_columns(pa, schema):
+    """The (names, columns) chunk of a file without rows, so that the table is still created with its columns."""
+    batch = pa.RecordBatch.from_arrays([pa.array([], type=field.type) for field in schema], schema=schema)
+    return _arrow_batch_columns(pa, batch)
+
+
+def _npy_chunks(path, chunkRows):
+    """Yield (names, columns) chunks of a 1-dimensional structured array stored in a npy file, read through np.memmap."""
+    arr = np.load(path, mmap_mode="r")
+    if arr.ndim != 1 or arr.dtype.names is None:
+        raise ValueError("The npy file must hold a 1-dimensional structured array, whose fields are the columns.")
+    names = list(arr.dtype.names)
+    # a file without rows still yields one empty chunk, which creates the table
+    for start in range(0, max(len(arr), 1), chunkRows):
+        chunk = arr[start:start + chunkRows]
+        yield names, [np.ascontiguousarray(chunk[field]) for field in names]
+
+
+def _parquet_chunks(path, chunkRows):
+    """Yield (names, columns) chunks of a memory-mapped Parquet file."""
+    pa = _import_pyarrow()
+    import pyarrow.parquet as pq
+    file = pq.ParquetFile(path, memory_map=True)
+    empty = True
+    for batch in file.iter_batches(batch_size=chunkRows):
+        empty = False
+        yield _arrow_batch_columns(pa, batch)
+    if empty:
+        yield _arrow_empty_columns(pa, file.schema_arrow)
+
+
+def _feather_chunks(path, chunkRows):
+    """Yield (names, columns) chunks of a memory-mapped Feather (Arrow IPC) file."""
+    pa = _import_pyarrow()
+    import pyarrow.ipc
+    reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+    empty = True
+    for i in range(reader.num_record_batches):
+        batch = reader.get_batch(i)
+        for start in range(0, batch.num_rows, chunkRows):
+            empty = False
+            yield _arrow_batch_columns(pa, batch.slice(start, chunkRows))
+    if empty:
+        yield _arrow_empty_columns(pa, reader.schema)
+
+
+_EXPORT_FORMATS = ("parquet", "feather", "csv")
+
+
+def _export_arrow_type(pa, ddbType):
+    """Arrow type of a DataFrame column of a block with DolphinDB type ddbType, or None to infer it from the values.
+
+    The types follow the DataFrame conversion of the blocks: temporal columns are datetime64[ns], and integral columns
+    with nulls, returned as float64, are written back as integers with nulls.
+    """
+    if ddbType in (DT_DATE, DT_MONTH, DT_TIME, DT_MINUTE, DT_SECOND, DT_DATETIME, DT_TIMESTAMP, DT_NANOTIME,
+                   DT_NANOTIMESTAMP, DT_DATEHOUR):
+        return pa.timestamp("ns")
+    if ddbType in (DT_SYMBOL, DT_STRING, DT_UUID, DT_IPPADDR, DT_INT128):
+        return pa.string()
+    return {
+        DT_BOOL: pa.bool_(),
+        DT_BYTE: pa.int8(),
+        DT_SHORT: pa.int16(),
+        DT_INT: pa.int32(),
+        DT_LONG: pa.int64(),
+        DT_FLOAT: pa.float32(),
+        DT_DOUBLE: pa.float64(),
+    }.get(ddbType)
+
+
+class _ArrowFileWriter(object):
+    """Write DataFrames to a Parquet or Feather (Arrow IPC) file.
+
+    The schema is built from the DolphinDB types of the columns of the first block when they are known, and inferred from
+    its values otherwise, so that a column which is entirely null in the first block keeps its type.
+    """
+    def __init__(self, path, format):
+        self.__pa = _import_pyarrow()
+        self.__path = path
+        self.__format = format
+        self.__writer = None
+        self.__schema = None
+
+    def write(self, df, ddbTypes=None):
+        pa = self.__pa
+        if self.__writer is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self.__schema = table.schema
+            if ddbTypes is not None and len(ddbTypes) == len(self.__schema):
+                for i, ddbType in enumerate(ddbTypes):
+                    arrowType = _export_arrow_type(pa, ddbType)
+                    if arrowType is not None and arrowType != self.__schema.field(i).type:
+                        self.__schema = self.__schema.set(i, self.__schema.field(i).with_type(arrowType))
+                if not self.__schema.equals(table.schema):
+                    table = pa.Table.from_pandas(df, schema=self.__schema, preserve_index=False)
+            if self.__format == "parquet":
+                import pyarrow.parquet as pq
+                self.__writer = pq.ParquetWriter(self.__path, self.__schema)
+            else:
+                import pyarrow.ipc
+                self.__writer = pa.ipc.new_file(self.__path, self.__schema)
+        else:
+            # converting with the schema, rather than casting the inferred table, also accepts null-typed and float columns
+            table = pa.Table.from_pandas(df, schema=self.__schema, preserve_index=False)
+        self.__writer.write_table(table)
+
+    def close(self):
+        if self.__writer is not None:
+            self.__writer.close()
+
+
+class _CSVFileWriter(object):
+    """Append DataFrames to a CSV file, writing the header with the first one."""
+    def __init__(self, path):
+        self.__file = open(path, "w", newline="")
+        self.__header = True
+
+    def write(self, df, ddbTypes=None):
+        df.to_csv(self.__file, header=self.__header, index=False)
+        self.__header = False
+
+    def close(self):
+        self.__file.close()
+
+
+def _write_blocks(blocks, path, format, lastTypes=None):
+    """Write an iterable of DataFrame blocks to a local file, one block at a time.
+
+    Args:
+        blocks : iterable of DataFrames with the same columns.
+        path : path of the file to be written.
+        format : "parquet", "feather" or "csv".
+        lastTypes : function returning the DolphinDB types of the columns of the last block, used for the Arrow schema. Defaults to None.
+
+    Returns:
+        the number of rows written.
+    """
+    if format not in _EXPORT_FORMATS:
+        raise ValueError("Unsupported format '{}', only 'parquet', 'feather' and 'csv' are supported.".format(format))
+    writer = _CSVFileWriter(path) if format == "csv" else _ArrowFileWriter(path, format)
+    rows = 0
+    try:
+        for block in blocks:
+            if not isinstance(block, pd.DataFrame):
+                raise ValueError("Only table results can be exported, got {}.".format(type(block).__name__))
+            writer.write(block, lastTypes() if lastTypes is not None else None)
+            rows += len(block)
+    finally:
+        writer.close()
+    return rows
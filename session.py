@@ -1,6 +1,6 @@
 """Session
 Package: session package. 
-        including classes session, DBConnectionPool, BatchTableWriter, MultithreadedTableWriter
+        including classes session, AsyncSession, PreparedFunction, DBConnectionPool, BatchTableWriter, MultithreadedTableWriter
 """
 
 from optparse import Option
@@ -13,8 +13,11 @@ from pandas import DataFrame
 import warnings
 from dolphindb.table import Table
 from dolphindb.database import Database
+from dolphindb.columnar import _columns_to_arrow, _columns_to_dataframe, _columns_into
+from dolphindb.columnar import _npy_chunks, _parquet_chunks, _feather_chunks, _write_blocks
+from dolphindb.cache import ResultCache, _normalize_script
 from dolphindb.settings import *
-from threading import Lock
+from threading import Lock, Event
 from threading import Thread
 from datetime import datetime
 import platform
@@ -22,7 +25,11 @@ import platform
 import os
 import sys
 import asyncio
+import time
 from concurrent.futures import Future, ThreadPoolExecutor
+from collections import deque
+from itertools import islice
+import queue
 
 sys.path.append(os.path.dirname(__file__))
 import dolphindbcpp  as ddbcpp
@@ -40,6 +47,83 @@ def _generate_tablename(tableName = None):
 def _generate_dbname():
     return "TMP_DB_" + uuid.uuid4().hex[:8]+"DB"
 
+
+def _check_compress(compress, compressThreshold):
+    if isinstance(compress, str) and compress != "auto":
+        raise ValueError("compress must be True, False or 'auto'")
+    if compress == "auto" and compressThreshold < 0:
+        raise ValueError("compressThreshold must be greater than or equal to 0")
+
+
+def _result_shape(result):
+    if isinstance(result, DataFrame):
+        return result.shape
+    if isinstance(result, np.ndarray) and result.ndim in (1, 2):
+        return (result.shape[0], 1 if result.ndim == 1 else result.shape[1])
+    if hasattr(result, "num_rows") and hasattr(result, "num_columns"):
+        return (result.num_rows, result.num_columns)
+    return (None, None)
+
+
+def _generate_funcname():
+    return "TMP_FUNC_" + uuid.uuid4().hex[:8]
+
+
+_FUNC_DEF = re.compile(r"\s*(defg|def)\b\s*(?:[A-Za-z_][A-Za-z0-9_]*)?\s*\(")
+
+
+# Assumed widths in bytes of the variable-width types, which have no entry in DATA_SIZE.
+_VARIABLE_WIDTH = {DT_STRING: 32, DT_SYMBOL: 4}
+_DEFAULT_ROW_WIDTH = 64
+
+
+def _row_width(types):
+    return max(1, sum(DATA_SIZE.get(t, 0) or _VARIABLE_WIDTH.get(t, 16) for t in types))
+
+
+class _FetchSizeTuner(object):
+    """Chooses the block size of run(..., fetchSize="auto").
+
+    The number of rows is the target bytes per block divided by the row width. The row width of a script is estimated from
+    the column types of its previous blocks and DATA_SIZE. The target follows the observed throughput so that a block takes
+    about targetSeconds to receive and decode, within [minBytes, maxBytes].
+    """
+    MIN_FETCH_SIZE = 8192
+    MAX_SCRIPTS = 256
+
+    def __init__(self, targetBytes=8*1024*1024, minBytes=1024*1024, maxBytes=64*1024*1024, targetSeconds=0.2):
+        self.__targetBytes = targetBytes
+        self.__minBytes = minBytes
+        self.__maxBytes = maxBytes
+        self.__targetSeconds = targetSeconds
+        self.__bytesPerSecond = None
+        self.__rowWidths = dict()  # normalized script -> estimated row width
+        self.__lock = Lock()
+
+    def fetchSize(self, script):
+        with self.__lock:
+            width = self.__rowWidths.get(_normalize_script(script), _DEFAULT_ROW_WIDTH)
+            return max(self.MIN_FETCH_SIZE, int(self.__targetBytes // width))
+
+    def observe(self, script, types, rows, seconds):
+        """Record the column types, number of rows and read time of a block of script."""
+        width = _row_width(types)
+        with self.__lock:
+            if len(self.__rowWidths) >= self.MAX_SCRIPTS:
+                self.__rowWidths.pop(next(iter(self.__rowWidths)))
+            self.__rowWidths[_normalize_script(script)] = width
+            if rows < self.MIN_FETCH_SIZE or seconds <= 0:
+                # the last block of a result is usually short and says little about the throughput
+                return
+            rate = width * rows / seconds
+            self.__bytesPerSecond = rate if self.__bytesPerSecond is None else 0.7 * self.__bytesPerSecond + 0.3 * rate
+            self.__targetBytes = min(self.__maxBytes, max(self.__minBytes, self.__bytesPerSecond * self.__targetSeconds))
+
+def _resolve_future(future):
+    if not future.done():
+        future.set_result(None)
+
+
 def start_thread_loop(loop):
     asyncio.set_event_loop(loop)
     loop.run_forever()
@@ -58,23 +142,28 @@ class DBConnectionPool(object):
         password : password. Defaults to None.
         loadBalance : whether to enable load balancing. True means enabled (the connections will be distributed evenly across the cluster), otherwise False. Defaults to False.
         highAvailability : whether to enable high availability. True means enabled, otherwise False. Defaults to False.
-        compress : whether to enable compression. True means enabled, otherwise False. Defaults to False.
+        compress : whether to enable compression. True means enabled, "auto" means only tables of at least compressThreshold bytes are compressed, otherwise False. Defaults to False.
         reConnect : whether to enable reconnection. True means enabled, otherwise False. Defaults to False.
         python : whether to enable the Python parser. True means enabled, otherwise False. Defaults to False.
+        compressThreshold : the estimated size in bytes from which a table is compressed when compress="auto". Defaults to 1 MB.
 
     Note:
         If the parameter python is True, the script is parsed in Python rather than DolphinDB language.
     """
-    def __init__(self, host:str, port:int, threadNum:int=10, userid:str=None, password:str=None, loadBalance:bool=False, highAvailability:bool=False, compress:bool=False,
-                 reConnect:bool=False, python:bool=False):
+    def __init__(self, host:str, port:int, threadNum:int=10, userid:str=None, password:str=None, loadBalance:bool=False, highAvailability:bool=False, compress:Union[bool, str]=False,
+                 reConnect:bool=False, python:bool=False, compressThreshold:int=1024*1024):
         """Constructor of DBConnectionPool, including the number of threads, load balancing, high availability, reconnection, compression and Pickle protocol."""
         userid = userid if userid is not None else ""
         password = password if password is not None else ""
-        self.pool = ddbcpp.dbConnectionPoolImpl(host, port, threadNum, userid, password, loadBalance, highAvailability, compress, reConnect, python)
+        _check_compress(compress, compressThreshold)
+        self.pool = ddbcpp.dbConnectionPoolImpl(host, port, threadNum, userid, password, loadBalance, highAvailability, bool(compress), reConnect, python)
+        if compress == "auto":
+            self.pool.setCompressThreshold(compressThreshold)
         self.host = host
         self.port = port
         self.userid = userid
         self.password = password
+        self.threadNum = threadNum
         self.taskId = 0
         self.mutex = Lock()
         self.loop = None
@@ -102,6 +191,9 @@ class DBConnectionPool(object):
         Note:
             When setting pickleTableToList=True and enablePickle=True, if the table contains array vectors, it will be converted to a NumPy 2d array.
             If the length of each row is different, the execution fails.
+
+        Note:
+            The coroutine is resumed by a thread of the pool as soon as the task is finished, instead of polling isFinished.
         """
         self.mutex.acquire()
         self.taskId = self.taskId + 1
@@ -110,13 +202,152 @@ class DBConnectionPool(object):
         if "clearMemory" not in kwargs.keys():
             kwargs["clearMemory"] = True
         self.pool.run(script, id, *args, **kwargs)
-        while True:
-            isFinished = self.pool.isFinished(id)
-            if(isFinished == 0):
-                await asyncio.sleep(0.01)
-            else:
-                return self.pool.getData(id)
+        await self.__finished(id)
+        return self.pool.getData(id)
+
+    def __finished(self, id):
+        # a future of the running loop, resolved by the watcher thread of the pool when the task is finished
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self.pool.watch(id, lambda _: loop.call_soon_threadsafe(_resolve_future, future))
+        return future
     
+    def upload(self, nameObjectDict:Dict[str, DataFrame]) -> None:
+        """Upload DataFrames in parallel over the connections of the pool, as shared tables.
+
+        Args:
+            nameObjectDict : Python dictionary object. The keys are the names of the shared tables and the values are DataFrames.
+
+        Note:
+            The variables of a connection are not visible to the other connections, so each DataFrame is shared with share(table, name) and can be used by all sessions.
+            The DataFrames are converted on worker threads and sent on different connections concurrently. The method returns when all uploads are done.
+            Sharing a table under the name of an existing shared table fails. Use undef(name, SHARED) to drop it first.
+            If any upload fails, the tables already shared by the call are undefined and the first error is raised once all uploads are finished.
+        """
+        for name, obj in nameObjectDict.items():
+            if not isinstance(obj, DataFrame):
+                raise ValueError("Only DataFrame can be uploaded through DBConnectionPool, '{}' is {}.".format(name, type(obj).__name__))
+        if not nameObjectDict:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.threadNum, len(nameObjectDict))) as executor:
+            futures = [(name, executor.submit(self.__share, name, df)) for name, df in nameObjectDict.items()]
+        error = None
+        shared = []
+        # every submitted task is waited for and collected, so that none is left in the pool
+        for name, future in futures:
+            try:
+                id = future.result()
+            except Exception as e:
+                error = error or e
+                continue
+            self.__wait(id)
+            try:
+                self.pool.getData(id)
+                shared.append(name)
+            except Exception as e:
+                error = error or e
+        if error is None:
+            return
+        for name in shared:
+            self.mutex.acquire()
+            self.taskId = self.taskId + 1
+            id = self.taskId
+            self.mutex.release()
+            try:
+                self.pool.run("undef(\"{}\", SHARED)".format(name), id)
+                self.__wait(id)
+                self.pool.getData(id)
+            except Exception:
+                pass
+        raise error
+
+    def __wait(self, id):
+        finished = Event()
+        self.pool.watch(id, lambda _: finished.set())
+        finished.wait()
+
+    def map(self, funcName:str, argTuples, ordered:bool=True, maxInFlight:Optional[int]=None, clearMemory:bool=True):
+        """Call a function once for each tuple of arguments over the connections of the pool.
+
+        Args:
+            funcName : name of the DolphinDB function to be called.
+            argTuples : iterable of tuples of arguments. It is consumed lazily as tasks finish.
+            ordered : whether to yield the results in the order of argTuples. Defaults to True.
+            maxInFlight : the maximum number of submitted calls whose results have not been returned. Defaults to 4 times threadNum.
+            clearMemory : whether to release variables after the calls. Defaults to True.
+
+        Returns:
+            a generator of the results. With ordered=False, it yields (index, result) pairs as the calls complete,
+            where index is the position of the arguments in argTuples.
+
+        Note:
+            Calls are submitted in batches: the arguments of a batch are converted together in C++, and an object passed to
+            several calls of a batch, such as a shared DataFrame, is converted once. The event loop of the pool is not used.
+            If a call fails, its error is raised by the generator and the calls in flight are waited for and discarded.
+        """
+        if maxInFlight is None:
+            maxInFlight = self.threadNum * 4
+        if maxInFlight <= 0:
+            raise ValueError("maxInFlight must be greater than 0")
+        return self.__map(funcName, iter(argTuples), ordered, maxInFlight, clearMemory)
+
+    def __map(self, funcName, argTuples, ordered, maxInFlight, clearMemory):
+        finished = queue.Queue()
+        pending = dict()  # taskId -> index in argTuples
+        results = dict()  # index -> result not yet yielded, with ordered=True
+        submitted = 0
+        nextIndex = 0
+
+        def submit(count):
+            batch = [tuple(args) for args in islice(argTuples, count)]
+            if not batch:
+                return 0
+            self.mutex.acquire()
+            firstId = self.taskId + 1
+            self.taskId = self.taskId + len(batch)
+            self.mutex.release()
+            self.pool.runBatch(funcName, firstId, batch, clearMemory)
+            for i in range(len(batch)):
+                pending[firstId + i] = submitted + i
+                self.pool.watch(firstId + i, finished.put)
+            return len(batch)
+
+        try:
+            submitted += submit(maxInFlight)
+            while pending:
+                id = finished.get()
+                index = pending.pop(id)
+                result = self.pool.getData(id)
+                if ordered:
+                    results[index] = result
+                    while nextIndex in results:
+                        yield results.pop(nextIndex)
+                        nextIndex += 1
+                else:
+                    yield index, result
+                # buffered results count against the window, so a slow first
+                # task cannot make the client hold more than maxInFlight results;
+                # refill in batches once half of the window is free
+                inFlight = len(pending) + len(results)
+                if inFlight <= maxInFlight // 2:
+                    submitted += submit(maxInFlight - inFlight)
+        finally:
+            while pending:
+                id = finished.get()
+                pending.pop(id)
+                try:
+                    self.pool.getData(id)
+                except RuntimeError:
+                    pass
+
+    def __share(self, name, df):
+        self.mutex.acquire()
+        self.taskId = self.taskId + 1
+        id = self.taskId
+        self.mutex.release()
+        self.pool.run("share", id, df, name)
+        return id
+
     def addTask(self, script:str, taskId:int, clearMemory:bool = True):
         """Add a task and specify the task ID to execute the script.
 
@@ -241,6 +472,10 @@ class DBConnectionPool(object):
         """
         return self.pool.getSessionId()
 
+    def compressStats(self) -> dict:
+        """Get the statistics of the adaptive compression enabled by compress="auto". See session.compressStats."""
+        return self.pool.getCompressStats()
+
 class streamDeserializer(object):
     """Deserializer stream blob in multistreamingtable reply.
 
@@ -276,25 +511,39 @@ class session(object):
     Args:
         keepAliveTime : the duration between two keepalive transmissions to detect the TCP connection status. Defaults to 30 (seconds). Set the parameter to release half-open TCP connections timely when the network is unstable.
         enableChunkGranularityConfig : whether to enable chunk granularity configuration. Defaults to False.
-        compress : whether to enable compressed communication. Defaults to False.
+        compress : whether to enable compressed communication. "auto" compresses only the uploaded tables of at least compressThreshold bytes. Defaults to False.
         enablePickle : whether to enable the Pickle protocol. Defaults to True.
         python : whether to enable python parser. Defaults to False.
+        compressThreshold : the estimated size in bytes from which an uploaded table is compressed when compress="auto". Defaults to 1 MB.
     
+    Note:
+        With compress="auto", the compression method is chosen per column: DELTA for integral and temporal columns, LZ4 for the others.
+        Use compressStats() to check how much data was compressed.
+
     Note:
         set enableSSL =True to enable encrypted communication. It's also required to configure enableHTTPS =true in the server.
     
     Note:
         set enableASYNC =True to enable asynchronous mode and the communication with the server can only be done through the session.run method. As there is no return value, it is suitable for asynchronous writes.
+
+    Note:
+        With enablePickle =False, the GIL is released while session.run waits for the server and deserializes the result, and it is re-acquired only to build the Python objects,
+        so threads owning different sessions run in parallel. session.run(..., pickleTableToList=True) is the exception: it keeps the conversion of the C++ API and holds the GIL. The GIL is also released by session.upload, blocked reads (fetchSize), tableAppender and tableUpsert.
+        With the default enablePickle =True, the result is unpickled by the C++ API while it is read from the socket, which needs the GIL:
+        it is held for the whole round-trip of session.run and other threads wait for the server too.
     """
     def __init__(self, host:Optional[str]=None, port:Optional[int]=None, userid:Optional[str]="", password:Optional[str]="",
                  enableSSL:bool=False, enableASYNC:bool=False,
-                 keepAliveTime:int=30, enableChunkGranularityConfig:bool=False, compress:bool=False, enablePickle:bool=True,
-                 python:bool=False, **kwargs):
+                 keepAliveTime:int=30, enableChunkGranularityConfig:bool=False, compress:Union[bool, str]=False, enablePickle:bool=True,
+                 python:bool=False, compressThreshold:int=1024*1024, **kwargs):
         """Constructor of session, inluding OpenSSL encryption, asynchronous mode, TCP detection, block granularity matching, compression, Pickle protocol."""
         if 'enableASYN' in kwargs.keys():
             enableASYNC = kwargs['enableASYN']
             DeprecationWarning("Please use enableASYNC instead of enableASYN.")
-        self.cpp = ddbcpp.sessionimpl(enableSSL, enableASYNC, keepAliveTime,compress,enablePickle,python)
+        _check_compress(compress, compressThreshold)
+        self.cpp = ddbcpp.sessionimpl(enableSSL, enableASYNC, keepAliveTime,bool(compress),enablePickle,python)
+        if compress == "auto":
+            self.cpp.setCompressThreshold(compressThreshold)
         self.host = host
         self.port = port
         self.userid = userid
@@ -303,6 +552,13 @@ class session(object):
         self.enableEncryption = True
         self.enableChunkGranularityConfig = enableChunkGranularityConfig
         self.enablePickle = enablePickle
+        self._resultCache = None
+        self._prepared = dict()
+        self._sharedUploads = dict()  # frame digest -> (tableName, Counter, objAddr)
+        self._sharedUploadsLock = Lock()
+        self._fetchTuner = _FetchSizeTuner()
+        self._connectArgs = None
+        self.lastStats = None
         if self.host is not None and self.port is not None:
             self.connect(host, port, userid, password, keepAliveTime=keepAliveTime)
     
@@ -342,6 +598,8 @@ class session(object):
             self.port = port
             self.userid = userid
             self.password = password
+            self._connectArgs = (host, port, userid, password, startup, highAvailability, highAvailabilitySites, keepAliveTime, reconnect)
+            self._registerPrepared()
             return True
         else:
             return False
@@ -371,6 +629,14 @@ class session(object):
         self.host = None
         self.port = None
         self.cpp.close()
+
+    def _reconnect(self):
+        # Reopen the connection with the arguments of the last connect. The server session, and its variables, is new.
+        self.cpp.close()
+        with self._sharedUploadsLock:
+            self._sharedUploads.clear()
+        if not self.connect(*self._connectArgs):
+            raise RuntimeError("Failed to reconnect to {}:{}".format(self._connectArgs[0], self._connectArgs[1]))
     
     def isClosed(self) -> bool:
         """Check if the current session has been closed.
@@ -380,19 +646,121 @@ class session(object):
         """
         return self.host is None
 
-    def upload(self, nameObjectDict):
+    def upload(self, nameObjectDict, chunkRows:Optional[int]=None):
         """Upload Python objects to DolphinDB server.
 
         Args:
             nameObjectDict : Python dictionary object. The keys of the dictionary are the variable names in DolphinDB and the values are Python objects, which can be numbers, strings, lists, DataFrame, etc.
+            chunkRows : the number of rows per chunk in which DataFrames are converted and sent. Defaults to None, meaning each object is converted and sent at once.
 
         Returns:
             the server address of the uploaded object.
         
         Note:
             A pandas DataFrame corresponds to DolphinDB table.
+            String columns (object dtype holding str, pandas string[pyarrow], pyarrow string arrays) and numpy S/U arrays are encoded in bulk as STRING.
+            Categorical columns with str categories are sent as SYMBOL: each category is encoded once and the values are sent as codes.
+
+        Note:
+            With chunkRows, a DataFrame longer than chunkRows is sent in row chunks which are appended to one table on the server.
+            At most two chunks are in flight, so the conversion of a chunk overlaps with the sending of the previous one and the client memory is bounded by the chunk size.
+            If a chunk fails, the partially filled table and the temporary tables of the chunks are undefined before the exception is raised.
         """
-        return self.cpp.upload(nameObjectDict)
+        for name in nameObjectDict.keys():
+            self._tableModified(name)
+        if chunkRows is None:
+            return self.cpp.upload(nameObjectDict)
+        if chunkRows <= 0:
+            raise ValueError("chunkRows must be greater than 0")
+        whole = {k: v for k, v in nameObjectDict.items() if not (isinstance(v, DataFrame) and len(v) > chunkRows)}
+        addrs = dict()
+        if whole:
+            addr = self.cpp.upload(whole)
+            addrs.update(zip(whole.keys(), addr if isinstance(addr, list) else [addr] * len(whole)))
+        for name, df in nameObjectDict.items():
+            if name not in whole:
+                chunks = (df.iloc[start:start + chunkRows] for start in range(0, len(df), chunkRows))
+                addrs[name] = self._uploadChunked(name, chunks, self._uploadFrameChunk)
+        addrs = [addrs[name] for name in nameObjectDict.keys()]
+        return addrs[0] if len(addrs) == 1 else addrs
+
+    def uploadFile(self, name:str, path:str, format:str="npy", chunkRows:int=1000000):
+        """Upload a table from a file chunk by chunk, without loading the whole file into memory.
+
+        Args:
+            name : the variable name of the table in DolphinDB.
+            path : path of the file.
+            format : the file format. "npy": a 1-dimensional NumPy structured array, whose fields are the columns. "parquet" or "feather": an Arrow file. Defaults to "npy".
+            chunkRows : the number of rows per chunk. Defaults to 1000000.
+
+        Returns:
+            the server address of the uploaded table.
+
+        Note:
+            The file is memory-mapped and its columns are sent chunk by chunk without building a DataFrame, as with upload(..., chunkRows=...).
+            A file without rows creates an empty table with the columns of the file.
+            pyarrow is required for "parquet" and "feather".
+        """
+        if chunkRows <= 0:
+            raise ValueError("chunkRows must be greater than 0")
+        if format == "npy":
+            chunks = _npy_chunks(path, chunkRows)
+        elif format == "parquet":
+            chunks = _parquet_chunks(path, chunkRows)
+        elif format == "feather":
+            chunks = _feather_chunks(path, chunkRows)
+        else:
+            raise ValueError("format must be 'npy', 'parquet' or 'feather'")
+        self._tableModified(name)
+        return self._uploadChunked(name, chunks, self._uploadColumnsChunk)
+
+    def _uploadFrameChunk(self, tmpName, chunk):
+        return self.cpp.upload({tmpName: chunk})
+
+    def _uploadColumnsChunk(self, tmpName, chunk):
+        names, columns = chunk
+        return self.cpp.uploadColumns(tmpName, names, columns)
+
+    def _uploadChunked(self, name, chunks, uploadChunk):
+        # uploadChunk(tmpName, chunk) sends one chunk. The first chunk creates the table, the others are
+        # uploaded to temporary tables and appended in order.
+        pending = deque()
+        addr = None
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            try:
+                for i, chunk in enumerate(chunks):
+                    tmpName = name if i == 0 else _generate_tablename(name)
+                    pending.append((tmpName, executor.submit(uploadChunk, tmpName, chunk)))
+                    if len(pending) >= 2:
+                        addr = self.__appendChunk(name, *pending.popleft(), addr)
+                while pending:
+                    addr = self.__appendChunk(name, *pending.popleft(), addr)
+            except BaseException:
+                for _, future in pending:
+                    future.cancel()
+                for tmpName, future in pending:
+                    if not future.cancelled() and future.exception() is None:
+                        self.__undef(tmpName)
+                # do not leave a table holding only the first chunks
+                self.__undef(name)
+                raise
+        return addr
+
+    def __appendChunk(self, name, tmpName, future, addr):
+        if tmpName == name:
+            return future.result()
+        try:
+            future.result()
+            self.run("{}.append!({})".format(name, tmpName))
+        finally:
+            self.__undef(tmpName)
+        return addr
+
+    def __undef(self, varName):
+        try:
+            self.run("undef('{}')".format(varName))
+        except Exception:
+            pass
 
     def run(self, script:str, *args, **kwargs):
         """Execute script.
@@ -407,22 +775,198 @@ class session(object):
         Kwargs:
             clearMemory : whether to release variables after queries. True means to release, otherwise False. Defaults to False.
             pickleTableToList : whether to convert table to list or DataFrame. True: to list, False: to DataFrame.  Defaults to False.
-            fetchSize : the size of a block.
+            fetchSize : the number of rows of a block. "auto" chooses it from the estimated row width and the throughput of previous blocked reads.
+            prefetch : with fetchSize, the number of blocks read ahead by a background thread while the current block is processed. Defaults to 0, meaning each block is read when requested.
+            format : the format of the result. "arrow" returns a table or vector as a pyarrow.Table built from the received column buffers. Defaults to None.
+            zeroCopy : whether to build the returned DataFrame or numpy array on the received buffers instead of copying them. Defaults to False.
+            useCache : whether to serve the result from the result cache and store it there. Only takes effect after enableResultCache is called. Defaults to False.
+            returnStats : whether to return the statistics of this call along with the result. Defaults to False.
+            out : a numpy array (vector result) or a dict of column name to numpy array (table result) to decode the result into. Defaults to None.
 
         Note:
             fetchSize cannot be less than 8192 Bytes.
 
         Returns:
             execution result. If fetchSize is specified, a BlockReader object will be returned. Each block can be read with the read() method.
+            If returnStats=True, a tuple of the result and a dictionary of statistics, which is also kept in session.lastStats.
+            Statistics are only collected when returnStats=True:
+                totalTime : seconds spent in run.
+                runTime : seconds spent by the C++ API from sending the request to the deserialized result, including the server execution.
+                decodeTime : seconds spent converting the result to Python objects. None with enablePickle=True, where the conversion is part of runTime.
+                rows, columns : shape of the returned table, vector or matrix. None for other results.
+                cached : whether the result was served from the result cache.
 
         Note:
             When setting pickleTableToList=True and enablePickle=True, if the table contains array vectors, it will be converted to a NumPy 2d array. If the length of each row is different, the execution fails.
+
+        Note:
+            With zeroCopy=True, numeric columns and NANOTIME and NANOTIMESTAMP columns share the received buffers.
+            Integral columns containing nulls and the other temporal columns, including TIMESTAMP, are converted to the dtypes of the default path.
+
+        Note:
+            With out, each array must hold at least as many rows as the result, and the returned object is a view of its first rows.
+            Columns with nulls need a float, datetime64 or object array. ValueError is raised otherwise.
         """
+        if not kwargs.pop("returnStats", False):
+            return self._run(script, *args, **kwargs)[0]
+        start = time.perf_counter()
+        result, cached = self._run(script, *args, **kwargs)
+        stats = self._makeStats(result, time.perf_counter() - start, cached)
+        self.lastStats = stats
+        return result, stats
+
+    def _run(self, script, *args, **kwargs):
         if(kwargs):
+            # set by Table to share the results of the handles of a DFS table, see Table._cacheScript
+            cacheScript = kwargs.pop("_cacheScript", script)
+            cacheTags = kwargs.pop("_cacheTags", ())
+            if kwargs.pop("useCache", False) and self._resultCache is not None and not args and "fetchSize" not in kwargs and "out" not in kwargs:
+                key = self._resultCache.makeKey(cacheScript, kwargs)
+                hit, result = self._resultCache.get(key)
+                if not hit:
+                    result, _ = self._run(script, **kwargs)
+                    self._resultCache.put(key, result, cacheTags)
+                return result, hit
             if "fetchSize" in kwargs.keys():
-                return BlockReader(self.cpp.runBlock(script, **kwargs))
-        return self.cpp.run(script, *args, **kwargs)
+                if kwargs["fetchSize"] != "auto":
+                    return BlockReader(self.cpp.runBlock(script, **kwargs), session=self), False
+                kwargs["fetchSize"] = self._fetchTuner.fetchSize(script)
+                observer = lambda types, rows, seconds: self._fetchTuner.observe(script, types, rows, seconds)
+                return BlockReader(self.cpp.runBlock(script, **kwargs), observer, session=self), False
+            format = kwargs.pop("format", None)
+            if format == "arrow":
+                return _columns_to_arrow(self.cpp.runColumns(script, *args, **kwargs)), False
+            elif format is not None:
+                raise ValueError("Unsupported format '{}', only 'arrow' is supported.".format(format))
+            out = kwargs.pop("out", None)
+            if out is not None:
+                return _columns_into(self.cpp.runColumns(script, *args, **kwargs), out), False
+            if kwargs.pop("zeroCopy", False):
+                return _columns_to_dataframe(self.cpp.runColumns(script, *args, **kwargs)), False
+        return self.cpp.run(script, *args, **kwargs), False
+
+    def _makeStats(self, result, totalTime, cached):
+        if cached:
+            stats = {"runTime": 0.0, "decodeTime": 0.0}
+        else:
+            stats = self.cpp.getLastStats()
+        stats["totalTime"] = totalTime
+        stats["rows"], stats["columns"] = _result_shape(result)
+        stats["cached"] = cached
+        return stats
+
+    def enableResultCache(self, maxBytes:int=256*1024*1024, ttl:Optional[float]=None) -> None:
+        """Enable the client-side cache of query results.
+
+        Results of run(..., useCache=True) and Table.toDF are kept in a LRU cache keyed by the script text with normalized whitespace.
+
+        Args:
+            maxBytes : the maximum total size of the cached results in bytes. Defaults to 256 MB.
+            ttl : the number of seconds a result stays valid. Defaults to None, meaning results never expire.
+
+        Note:
+            Table.append, Table.drop, TableUpdate.execute, TableDelete.execute and upload drop the cached results that read the modified table.
+            Table objects of the same DFS table, e.g. returned by several calls of loadTable, share their cached results and their invalidation.
+            Modifications made by other scripts, sessions or clients are only observed after the results expire, so set ttl when the tables are written elsewhere.
+        """
+        self._resultCache = ResultCache(maxBytes, ttl)
+
+    def disableResultCache(self) -> None:
+        """Disable the result cache and release the cached results."""
+        self._resultCache = None
+
+    def clearResultCache(self) -> None:
+        """Drop all cached results."""
+        if self._resultCache is not None:
+            self._resultCache.clear()
+
+    def _invalidateResultCache(self, tableName:str) -> None:
+        if self._resultCache is not None:
+            self._resultCache.invalidate(tableName)
+
+    def _tableModified(self, tableName:str, sourceTag:Optional[str]=None) -> None:
+        self._invalidateResultCache(tableName)
+        if sourceTag is not None:
+            self._invalidateResultCache(sourceTag)
+        self._forgetSharedUpload(tableName)
+
+    def _acquireSharedUpload(self, digest:str):
+        """Return (tableName, Counter, objAddr) of a live upload of the frame with this digest, holding a new reference to it, or None."""
+        with self._sharedUploadsLock:
+            entry = self._sharedUploads.get(digest)
+            if entry is None or entry[1].val() <= 0:
+                return None
+            entry[1].inc()
+            return entry
+
+    def _registerSharedUpload(self, digest:str, tableName:str, counter, objAddr) -> None:
+        with self._sharedUploadsLock:
+            self._sharedUploads[digest] = (tableName, counter, objAddr)
+
+    def _releaseSharedUpload(self, digest:str, tableName:str, counter) -> int:
+        # The reference is dropped under the registry lock so that a concurrent lookup cannot revive a table being undefined.
+        with self._sharedUploadsLock:
+            remaining = counter.dec()
+            if remaining == 0:
+                entry = self._sharedUploads.get(digest)
+                if entry is not None and entry[0] == tableName:
+                    del self._sharedUploads[digest]
+            return remaining
+
+    def _forgetSharedUpload(self, tableName:str) -> None:
+        with self._sharedUploadsLock:
+            for digest in [k for k, v in self._sharedUploads.items() if v[0] == tableName]:
+                del self._sharedUploads[digest]
     
+    def runMany(self, scripts:List[str], **kwargs):
+        """Execute several scripts in one round-trip.
+
+        The scripts are sent to the server together and executed in order, so statements that would each need a call of run only wait for the network once.
+
+        Args:
+            scripts : list of DolphinDB scripts to be executed.
+
+        Kwargs:
+            clearMemory : whether to release variables after queries. True means to release, otherwise False. Defaults to False.
+            pickleTableToList : whether to convert table to list or DataFrame. True: to list, False: to DataFrame.  Defaults to False.
+
+        Returns:
+            execution result of the last script.
+
+        Note:
+            If a script fails, the subsequent scripts are not executed.
+        """
+        if isinstance(scripts, str):
+            scripts = [scripts]
+        if len(scripts) == 0:
+            return None
+        return self.run("\n".join(scripts), **kwargs)
+
+    def prepare(self, script:str) -> Type["PreparedFunction"]:
+        """Define a function on the server once and return a handle to call it.
+
+        Args:
+            script : DolphinDB function definition, e.g. "def (x, y) { return x + y }". The function name, if any, is replaced with a generated one.
+
+        Returns:
+            a PreparedFunction object. Calling it passes the arguments as DolphinDB objects through run(funcName, *args), so the script is not sent again.
+
+        Note:
+            The prepared functions are defined again after connect() is called, and when a call fails because the server no longer knows the function.
+        """
+        m = _FUNC_DEF.match(script)
+        if m is None:
+            raise ValueError("script must be a function definition, e.g. def (x, y) { return x + y }")
+        name = _generate_funcname()
+        definition = m.group(1) + " " + name + "(" + script[m.end():]
+        self.run(definition)
+        self._prepared[name] = definition
+        return PreparedFunction(self, name)
+
+    def _registerPrepared(self):
+        if self._prepared:
+            self.runMany(list(self._prepared.values()))
+
     def runFile(self, filepath:str, *args, **kwargs):
         """Execute script.
 
@@ -606,9 +1150,8 @@ class session(object):
         tblName = tbl.tableName()
         dbName =  _generate_dbname()
         s1 = dbName+"=database('"+dbPath+"')"
-        self.run(s1)
         s2 = "saveTable(%s, %s)" % (dbName, tblName)
-        self.run(s2)
+        self.runMany([s1, s2])
         return True
 
     def loadText(self,  remoteFilePath:str, delimiter:str=",") -> Type["Table"]:
@@ -706,7 +1249,10 @@ class session(object):
             fmtDict['inMem'] = str(memoryMode).lower()
             runstr = re.sub(' +', ' ', runstr.format(**fmtDict).strip())
             self.run(runstr)
-            return Table(data=tbName, s=self, isMaterialized=True)
+            table = Table(data=tbName, s=self, isMaterialized=True)
+            if not partitions and not memoryMode:
+                table._setSource(dbPath, tableName)
+            return table
         else:
             return Table(data=tableName, s=self, needGC=False, isMaterialized=True)
 
@@ -722,13 +1268,11 @@ class session(object):
             a Table object.
         """
         # loadTableBySQL
-        runstr = 'db=database("' + dbPath + '")'
-        self.run(runstr)
-        runstr = tableName + '= db.loadTable("%s")' % tableName
-        self.run(runstr)
+        scripts = ['db=database("' + dbPath + '")']
+        scripts.append(tableName + '= db.loadTable("%s")' % tableName)
         tmpTableName = _generate_tablename()
-        runstr = tmpTableName + "=loadTableBySQL(<%s>)" % sql
-        self.run(runstr)
+        scripts.append(tmpTableName + "=loadTableBySQL(<%s>)" % sql)
+        self.runMany(scripts)
         return Table(data=tmpTableName, s=self, isMaterialized=True)
 
     def convertDatetime64(self, datetime64List):
@@ -891,16 +1435,16 @@ class session(object):
             tableName : table name. Defaults to None, indicating all tables under the partitions are deleted.
         """
         db = _generate_dbname()
-        self.run(db + '=database("' + dbPath + '")')
+        dbstr = db + '=database("' + dbPath + '")'
         if isinstance(partitionPaths, list):
             pths = ','.join(partitionPaths)
         else:
             pths = partitionPaths
 
         if tableName:
-            self.run("dropPartition(%s,[%s],\"%s\")" % (db, pths, tableName))
+            self.runMany([dbstr, "dropPartition(%s,[%s],\"%s\")" % (db, pths, tableName)])
         else:
-            self.run("dropPartition(%s,[%s])" % (db, pths))
+            self.runMany([dbstr, "dropPartition(%s,[%s])" % (db, pths)])
 
     def dropTable(self, dbPath:str, tableName:str) -> None:
         """Delete a table.
@@ -910,8 +1454,7 @@ class session(object):
             tableName : table name.
         """
         db = _generate_dbname()
-        self.run(db + '=database("' + dbPath + '")')
-        self.run("dropTable(%s,'%s')" % (db,tableName))
+        self.runMany([db + '=database("' + dbPath + '")', "dropTable(%s,'%s')" % (db,tableName)])
 
     def loadTextEx(self, dbPath:str, tableName:str,  partitionColumns:Optional[List[str]]=None, remoteFilePath:str=None, delimiter:str=",") -> Type["Table"]:
         """Import a partitioned in-memory table.
@@ -929,9 +1472,10 @@ class session(object):
         if partitionColumns is None:
             partitionColumns = []
         isDBPath = True
+        scripts = []
         if "/" in dbPath or "\\" in dbPath or "dfs://" in dbPath:
             dbstr ='db=database("' + dbPath + '")'
-            self.run(dbstr)
+            scripts.append(dbstr)
             tbl_str = '{tableNameNEW} = loadTextEx(db, "{tableName}", {partitionColumns}, "{remoteFilePath}", {delimiter})'
         else:
             isDBPath = False
@@ -944,7 +1488,8 @@ class session(object):
         fmtDict['delimiter'] = delimiter
         # tbl_str = tableName+'=loadTextEx(db,"' + tableName + '",'+ str(partitionColumns) +',"'+ remoteFilePath+"\",'"+delimiter+"')"
         tbl_str = re.sub(' +', ' ', tbl_str.format(**fmtDict).strip())
-        self.run(tbl_str)
+        scripts.append(tbl_str)
+        self.runMany(scripts)
         if isDBPath:
             return Table(data=fmtDict['tableName'] , dbPath=dbPath, s=self)
         else:
@@ -1012,22 +1557,250 @@ class session(object):
         return Table(dbPath=dbPath, data=data,  tableAliasName=tableAliasName, inMem=inMem, partitions=partitions, s=self)
     
 
+    def compressStats(self) -> dict:
+        """Get the statistics of the adaptive compression enabled by compress="auto".
+
+        Returns:
+            a dictionary with keys threshold, tables (number of tables sent), compressedTables, bytes (estimated size of the tables sent) and compressedBytes (estimated size of the tables compressed).
+
+        Note:
+            The sizes are estimated from the column types before compression. The C++ API does not report the size of the compressed messages.
+        """
+        return self.cpp.getCompressStats()
+
     def _loadPickleFile(self, filePath):
         return self.cpp.loadPickleFile(filePath)
     def _printPerformance(self):
         self.cpp.printPerformance()
-    
+
+class PreparedFunction(object):
+    """Handle of a function defined on the server by session.prepare.
+
+    Args:
+        s : the session in which the function is defined.
+        name : name of the function on the server.
+    """
+    def __init__(self, s:session, name:str):
+        """Constructor of PreparedFunction."""
+        self.__session = s
+        self.__name = name
+
+    def name(self) -> str:
+        """Get the name of the function on the server."""
+        return self.__name
+
+    def __call__(self, *args, **kwargs):
+        """Call the function.
+
+        Args:
+            args : arguments to be passed to the function.
+
+        Kwargs:
+            same as session.run.
+
+        Returns:
+            the return value of the function.
+        """
+        try:
+            return self.__call(*args, **kwargs)
+        except RuntimeError as e:
+            msg = str(e)
+            if self.__name not in msg or "recognize" not in msg:
+                raise
+        self.__session._registerPrepared()
+        return self.__call(*args, **kwargs)
+
+    def __call(self, *args, **kwargs):
+        if args:
+            return self.__session.run(self.__name, *args, **kwargs)
+        return self.__session.run(self.__name + "()", **kwargs)
+
+    def release(self) -> None:
+        """Remove the function from the server."""
+        if self.__session._prepared.pop(self.__name, None) is not None:
+            self.__session.run("undef(`{}, DEF)".format(self.__name))
+
+
+class AsyncSession(object):
+    """AsyncSession is the asyncio counterpart of session, whose methods run, upload and loadTable are coroutine functions.
+
+    AsyncSession is an executor wrapper: each call runs the blocking method of a session on a single worker thread, with
+    loop.run_in_executor. It does not use non-blocking sockets. Each AsyncSession owns one connection, so only one call is
+    in flight at a time; calls are sent to the server in the order they are awaited.
+
+    Args:
+        host : server address. It can be IP address, domain, or LAN hostname, etc. Defaults to None.
+        port : port name. Defaults to None.
+        userid : username. Defaults to "", meaning not to log in.
+        password : password. Defaults to "", meaning not to log in.
+        kwargs : other arguments passed to the constructor of session, such as enableSSL, compress and enablePickle. enablePickle defaults to False.
+
+    Note:
+        The worker thread releases the GIL while it waits for the server, so the event loop keeps running during a round-trip.
+        This does not hold with enablePickle=True, where the GIL is held while the result is read from the socket (see session).
+
+    Note:
+        Use one AsyncSession per concurrent query stream. To run many queries in parallel, create several AsyncSession objects or use DBConnectionPool.
+
+    Note:
+        loadTable returns an AsyncTable, whose methods also run on the worker thread. The underlying session must not be used from the event loop.
+    """
+    def __init__(self, host:Optional[str]=None, port:Optional[int]=None, userid:Optional[str]="", password:Optional[str]="", **kwargs):
+        """Constructor of AsyncSession."""
+        kwargs.setdefault("enablePickle", False)
+        self.session = session(host, port, userid, password, **kwargs)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def __del__(self):
+        executor = getattr(self, "executor", None)
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    async def _submit(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: func(*args, **kwargs))
+
+    async def connect(self, host:str, port:int, userid:str=None, password:str=None, **kwargs) -> bool:
+        """Coroutine function. Establish connection, with the same arguments as session.connect.
+
+        Returns:
+            whether the connection is established. True if established, otherwise False.
+        """
+        return await self._submit(self.session.connect, host, port, userid, password, **kwargs)
+
+    async def run(self, script:str, *args, **kwargs):
+        """Coroutine function. Execute script, with the same arguments as session.run.
+
+        Args:
+            script : DolphinDB script to be executed.
+            args : arguments to be passed to the function.
+
+        Note:
+            args is only required when script is the function name.
+
+        Returns:
+            execution result.
+        """
+        return await self._submit(self.session.run, script, *args, **kwargs)
+
+    async def upload(self, nameObjectDict, chunkRows:Optional[int]=None):
+        """Coroutine function. Upload Python objects to DolphinDB server.
+
+        Args:
+            nameObjectDict : Python dictionary object. The keys of the dictionary are the variable names in DolphinDB and the values are Python objects.
+            chunkRows : the number of rows per chunk in which DataFrames are sent. Defaults to None. See session.upload.
+
+        Returns:
+            the server address of the uploaded object.
+        """
+        return await self._submit(self.session.upload, nameObjectDict, chunkRows=chunkRows)
+
+    async def loadTable(self, tableName:str, dbPath:Optional[str]=None, partitions=None, memoryMode:bool=False) -> "AsyncTable":
+        """Coroutine function. Load a DolphinDB table, with the same arguments as session.loadTable.
+
+        Returns:
+            an AsyncTable wrapping the Table object bound to the underlying session.
+        """
+        table = await self._submit(self.session.loadTable, tableName, dbPath, partitions, memoryMode)
+        return AsyncTable(self, table)
+
+    def _release(self, obj):
+        # Drop the last reference to obj on the worker thread, so that the undef run by Table.__del__ does not block
+        # the event loop and is ordered with the other calls.
+        holder = [obj]
+        del obj
+        try:
+            self.executor.submit(holder.clear)
+        except RuntimeError:
+            # the worker is shut down, and the session closed with it
+            pass
+
+    def close(self):
+        """Close the connection and the worker thread.
+
+        Note:
+            The method does not block: the connection is closed on the worker thread after the calls already submitted.
+        """
+        self.executor.submit(self.session.close)
+        self.executor.shutdown(wait=False)
+
+    def isClosed(self) -> bool:
+        """Check if the current session has been closed.
+
+        Returns:
+            bool: True if closed, otherwise False.
+        """
+        return self.session.isClosed()
+
+
+class AsyncTable(object):
+    """Table object of an AsyncSession, returned by AsyncSession.loadTable.
+
+    Every method of Table is available as a coroutine function that runs on the worker thread of the AsyncSession,
+    e.g. await t.toDF(). Methods returning a Table or a query builder, such as select or where, return an AsyncTable wrapping it:
+    df = await (await t.select("x")).toDF().
+
+    Args:
+        asyncSession : the AsyncSession.
+        table : the wrapped Table or query builder.
+
+    Note:
+        The wrapped object is released on the worker thread, so the undef of a temporary table does not block the event loop.
+    """
+    def __init__(self, asyncSession:AsyncSession, table):
+        """Constructor of AsyncTable."""
+        self.__async = asyncSession
+        self.__table = table
+
+    def __del__(self):
+        asyncSession = getattr(self, "_AsyncTable__async", None)
+        if asyncSession is not None:
+            asyncSession._release(self.__table)
+
+    @property
+    def table(self):
+        """The wrapped object. Its methods block and must not be called from the event loop."""
+        return self.__table
+
+    def __getattr__(self, name):
+        if name.startswith("_AsyncTable__"):
+            raise AttributeError(name)
+        attr = getattr(self.__table, name)
+        if not callable(attr):
+            return attr
+        del attr
+
+        async def method(*args, **kwargs):
+            # the method is looked up on the worker thread, so that only this wrapper refers to the table on the event loop
+            result = await self.__async._submit(self.__call, name, args, kwargs)
+            if type(result).__module__ == Table.__module__:
+                return AsyncTable(self.__async, result)
+            return result
+        return method
+
+    def __call(self, name, args, kwargs):
+        return getattr(self.__table, name)(*args, **kwargs)
+
 class BlockReader(object):
     """Read in blocks. 
     
     Specify the paramter fetchSize for method session.run and it returns a BlockReader object to read in blocks.
+    BlockReader is iterable: for block in session.run(script, fetchSize=...) reads all blocks in order.
 
     Args:
         blockReader : dolphindbcpp object.
+        observer : function called with the column types, number of rows and read time in seconds of each block. With prefetch, the read time is measured on the background thread and excludes the time the block was queued. Defaults to None.
+        session : the session that runs the query, required by cancel. Defaults to None.
+
+    Note:
+        With session.run(..., prefetch=k), up to k blocks are received and deserialized by a background thread while the current block is processed.
+        The session must not run other scripts until all blocks are read or skipAll is called.
     """
-    def __init__(self, blockReader):
+    def __init__(self, blockReader, observer:Callable=None, session=None):
         """Constructor of BlockReader."""
         self.block = blockReader
+        self.__observer = observer
+        self.__session = session
 
     def read(self):
         """Read a piece of data.
@@ -1035,7 +1808,10 @@ class BlockReader(object):
         Returns:
             execution result of a script.
         """
-        return self.block.read()
+        result = self.block.read()
+        if self.__observer is not None:
+            self.__observer(self.block.lastTypes(), len(result), self.block.lastSeconds())
+        return result
 
     def hasNext(self) -> bool:
         """Check if there is data to be read.
@@ -1045,6 +1821,48 @@ class BlockReader(object):
         """
         return self.block.hasNext()
 
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.block.hasNext():
+            raise StopIteration
+        return self.read()
+
+    def export(self, path:str, format:str="parquet") -> int:
+        """Write the remaining blocks to a local file as they are read.
+
+        Only one block is held in memory at a time, so the size of the result is not limited by the client memory.
+
+        Args:
+            path : path of the file to be written.
+            format : "parquet", "feather" or "csv". Defaults to "parquet".
+
+        Returns:
+            the number of rows written.
+
+        Note:
+            pyarrow is required for "parquet" and "feather". The schema of the file is built from the DolphinDB types of the columns.
+            If writing fails, the remaining blocks are skipped so that the session can be used again.
+        """
+        try:
+            return _write_blocks(self, path, format, self.block.lastTypes)
+        except BaseException:
+            if self.hasNext():
+                self.skipAll()
+            raise
+
+    def toParquet(self, path:str) -> int:
+        """Write the remaining blocks to a local Parquet file as they are read. See export.
+
+        Args:
+            path : path of the Parquet file.
+
+        Returns:
+            the number of rows written.
+        """
+        return self.export(path, format="parquet")
+
     def skipAll(self):
         """Skip subsequent data.
 
@@ -1054,6 +1872,29 @@ class BlockReader(object):
         """
         self.block.skipAll()
 
+    def cancel(self):
+        """Abort the reading without receiving the remaining blocks.
+
+        The job of the session is cancelled on the server from a separate connection, then the session is reconnected
+        to discard the part of the result already sent.
+
+        Note:
+            The reconnected session starts a new server session: variables defined in the previous one, including the tables
+            of Table objects created from DataFrames, are lost. Functions defined with session.prepare are defined again.
+            Nothing happens if all blocks have been received.
+            With prefetch, cancel returns once the background thread has stopped receiving: the connection is only closed after that.
+        """
+        if self.__session is None:
+            raise RuntimeError("cancel is only supported for a BlockReader returned by session.run")
+        if not self.block.cancel():
+            return
+        try:
+            self.__session.cpp.cancelJobs()
+        finally:
+            # the socket must not be closed while the prefetch thread reads from it
+            self.block.waitStopped()
+            self.__session._reconnect()
+
 class PartitionedTableAppender(object):
     """Class for writes to DolphinDB DFS tables.
 
@@ -1102,6 +1943,10 @@ class tableAppender(object) :
         tableName : table name. Defaults to None.
         ddbSession : a session connected to DolphinDB server. Defaults to None.
         action : the action when appending. Now only supports "fitColumnType", indicating to convert the data type of temporal column. Defaults to "fitColumnType".
+
+    Note:
+        If every column of the table has a DataFrame column of the same name (case-insensitive), the columns are matched by name and converted
+        directly to the column types of the table. Otherwise they are matched by position.
     """
     def __init__(self, dbPath:str=None, tableName:str=None, ddbSession:session=None, action:str="fitColumnType"):
         """Constructor of tableAppender"""
@@ -1137,6 +1982,9 @@ class tableUpsert(object) :
         ignoreNull : if set to true, for the NULL values in the new data, the correponding elements in the table are not updated. Defaults to False.
         keyColNames : key column names. For a DFS table, the columns specified by this parameter are considrd as key columns. Defaults to [].
         sortColumns : sort column names. All data in the updated partition will be sorted according to the specified column. Defaults to [].
+
+    Note:
+        The DataFrame columns are matched with the columns of the table as in tableAppender.
     """
     def __init__(self, dbPath:str=None, tableName:str=None, ddbSession:session=None, ignoreNull:bool = False, keyColNames:List[str] = [], sortColumns:List[str]=[]):
         """Constructor of tableUpsert."""
@@ -66,6 +66,7 @@ DATA_SIZE[DT_DATETIME] = 4
 DATA_SIZE[DT_TIMESTAMP] = 8
 DATA_SIZE[DT_NANOTIME] = 8
 DATA_SIZE[DT_NANOTIMESTAMP] = 8
+DATA_SIZE[DT_DATEHOUR] = 4
 DATA_SIZE[DT_FLOAT] = 4
 DATA_SIZE[DT_DOUBLE] = 8
 DATA_SIZE[DT_SYMBOL] = 0
@@ -97,6 +98,7 @@ DBNAN[DT_DATETIME] = -2147483648
 DBNAN[DT_TIMESTAMP] = -9223372036854775808
 DBNAN[DT_NANOTIME] = -9223372036854775808
 DBNAN[DT_NANOTIMESTAMP] = -9223372036854775808
+DBNAN[DT_DATEHOUR] = -2147483648
 DBNAN[DT_UUID]=0
 DBNAN[DT_INT128]=0
 DBNAN[DT_IPPADDR]=0
@@ -1,11 +1,15 @@
 # from __future__ import annotations
 from typing import Any, Callable, List, Optional, Tuple, Union, Type
 from pandas import DataFrame
+from pandas import concat
+from pandas.util import hash_pandas_object
 from dolphindb.vector import Vector
 from dolphindb.vector import FilterCond
 from dolphindb.settings import get_verbose
+from dolphindb.columnar import _import_pyarrow
 import uuid
 import copy
+import hashlib
 import numpy as np
 import re
 import inspect
@@ -21,6 +25,44 @@ def _generate_tablename(tableName = None):
         return tableName + "_" + uuid.uuid4().hex[:8]
 
 
+def _frame_digest(df):
+    """Digest of the column names, dtypes and values of a DataFrame, or None if its values cannot be hashed."""
+    try:
+        rowHashes = hash_pandas_object(df, index=False).values
+    except TypeError:
+        return None
+    h = hashlib.sha1()
+    h.update(repr([(str(name), str(dtype)) for name, dtype in df.dtypes.items()]).encode())
+    h.update(rowHashes.tobytes())
+    return h.hexdigest()
+
+
+def _select_is_row_wise(cols):
+    """Whether each column of a select list only reads its own row: column names, literals and operators, optionally aliased.
+
+    Any function call is rejected, as it may be an aggregate (sum, count, distinct) or depend on the row order (cumsum, mavg, prev).
+    """
+    return all(re.search(r'[A-Za-z_]\w*\s*\(', str(col)) is None for col in cols)
+
+
+def _iter_batches(s, query, rows, format, prefetch):
+    """Run query through the blocked-fetch path and return a generator of its blocks as DataFrames or pyarrow.RecordBatch."""
+    if format not in ("pandas", "arrow"):
+        raise ValueError("Unsupported format '{}', only 'pandas' and 'arrow' are supported.".format(format))
+    pa = _import_pyarrow() if format == "arrow" else None
+
+    def batches():
+        reader = s.run(query, fetchSize=rows, prefetch=prefetch)
+        try:
+            for block in reader:
+                yield block if pa is None else pa.RecordBatch.from_pandas(block, preserve_index=False)
+        finally:
+            # the iteration was abandoned or failed, release the socket for the next script
+            if reader.hasNext():
+                reader.skipAll()
+    return batches()
+
+
 def _getFuncName(f):
     if isinstance(f, str):
         return f
@@ -80,9 +122,18 @@ class Table(object):
         s : the connected session object. Defaults to None.
         needGC : whether to enable garbage collection. True: enable garbage collection. Defaults to True.
         isMaterialized : whether table is materialized True: table has been materialized. Defaults to False.
+        dedup : whether to reuse the server table of an identical DataFrame uploaded earlier by this session. Defaults to False.
+
+    Note:
+        With dedup=True, data is hashed and, if a Table created from a DataFrame with the same columns, dtypes and values is still alive, no upload happens and both Table objects refer to the same server table.
+        The server table is undefined when the last of them is deleted. It is no longer reused once it is modified by Table.append, Table.update, Table.delete or Table.drop.
+        Such a modification first copies the server table if other Table objects, including ones derived from the modified one by select or copy,
+        still refer to it: the modified Table moves to the copy and the others keep the unmodified data.
+        dedup only applies to DataFrame or dict data without tableAliasName and with needGC=True.
     """
     def __init__(self, dbPath:str=None, data=None, tableAliasName:str=None, partitions:Optional[List[str]]=None,
-                 inMem:bool=False, schemaInited:bool=False, s=None, needGC:bool=True, isMaterialized:bool=False):
+                 inMem:bool=False, schemaInited:bool=False, s=None, needGC:bool=True, isMaterialized:bool=False,
+                 dedup:bool=False):
         """Constructor of Table."""
         if partitions is None:
             partitions = []
@@ -94,6 +145,8 @@ class Table(object):
         self.__rightTable = None
         self.__merge_for_update = False
         self.__objAddr = None
+        self.__digest = None
+        self.__source = None
         self.isMaterialized = isMaterialized
         if tableAliasName is not None:
             self.isMaterialized = True
@@ -116,8 +169,20 @@ class Table(object):
                 self._setTableName(_generate_tablename())
             else:
                 self._setTableName(tableAliasName)
-            #self.__session.upload({self.__tableName: df})
-            self.__objAddr = self.__session.upload({self.__tableName: df})
+            shared = None
+            if dedup and tableAliasName is None and self.__need_gc:
+                self.__digest = _frame_digest(df)
+                if self.__digest is not None:
+                    shared = self.__session._acquireSharedUpload(self.__digest)
+            if shared is not None:
+                self._setTableName(shared[0])
+                self.__ref = shared[1]
+                self.__objAddr = shared[2]
+            else:
+                #self.__session.upload({self.__tableName: df})
+                self.__objAddr = self.__session.upload({self.__tableName: df})
+                if self.__digest is not None:
+                    self.__session._registerSharedUpload(self.__digest, self.__tableName, self.__ref, self.__objAddr)
             self.vecs = {}
 
             # self.__session.run("share %s as S%s" % (self.__tableName, self.__tableName))
@@ -143,6 +208,8 @@ class Table(object):
                 fmtDict['inMem'] = str(inMem).lower()
                 runstr = re.sub(' +', ' ', runstr.format(**fmtDict).strip())
                 self.__session.run(runstr)
+                if not partitions and not inMem:
+                    self._setSource(dbPath, data)
                 # runstr = '%s = select * from %s' %(self.__tableName, self.__tableName)
                 # self.__session.run(runstr)
             else:
@@ -161,6 +228,7 @@ class Table(object):
         newTable = Table(data=self.__tableName, schemaInited=True, s=self.__session, needGC=self.__need_gc)
         newTable._setExec(self.isExec)
         newTable.isMaterialized = self.isMaterialized
+        newTable.__source = self.__source
         try:
             newTable.vecs = copy.deepcopy(self.vecs, memodict)
         except AttributeError:
@@ -219,6 +287,7 @@ class Table(object):
         try:
             if self.__need_gc:
                 newTable.__ref = self.__ref
+                newTable.__digest = self.__digest
                 self.__ref.inc()
         except AttributeError:
             pass
@@ -229,6 +298,7 @@ class Table(object):
         newTable = Table(data=self.__tableName, schemaInited=True, s=self.__session, needGC=self.__need_gc)
         newTable._setExec(self.isExec)
         newTable.isMaterialized = self.isMaterialized
+        newTable.__source = self.__source
         try:
             newTable.vecs = copy.copy(self.vecs)
         except AttributeError:
@@ -287,6 +357,7 @@ class Table(object):
         try:
             if self.__need_gc:
                 newTable.__ref = self.__ref
+                newTable.__digest = self.__digest
                 self.__ref.inc()
                 # print("in copy ", self.__tableName, self.__ref.val())
         except AttributeError:
@@ -297,7 +368,7 @@ class Table(object):
     def __del__(self):
         # print("try to del ", self.__tableName, self.__ref.val())
         if self.__need_gc:
-            if self.__ref.dec() == 0:
+            if self.__releaseRef() == 0:
                 # print('do __del__', self.__tableName)
                 try:
                     # this is not a real table name such as join table, no need to undef.
@@ -321,6 +392,30 @@ class Table(object):
             # else:
             #     print('__del__', self.__ref.val())
 
+    def _detachShared(self):
+        """Give this Table its own copy of a server table shared through dedup, before the table is modified."""
+        if not self.__need_gc or self.__digest is None:
+            return
+        # withdraw the table first so that no Table created from now on can acquire it
+        self.__session._forgetSharedUpload(self.__tableName)
+        if self.__ref.val() > 1:
+            oldName = self.__tableName
+            newName = _generate_tablename()
+            self.__session.run("{} = select * from {}".format(newName, oldName))
+            if self.__releaseRef() == 0:
+                # the other references were dropped in the meantime
+                self.__session.run("undef('{}')".format(oldName))
+            self.__ref = Counter()
+            self.__objAddr = None
+            self._setTableName(newName)
+            self.vecs = {colName: Vector(name=colName, tableName=newName, s=self.__session) for colName in self.vecs}
+        self.__digest = None
+
+    def __releaseRef(self):
+        if self.__digest is None:
+            return self.__ref.dec()
+        return self.__session._releaseSharedUpload(self.__digest, self.__tableName, self.__ref)
+
     def _setSelect(self, cols):
         self.__schemaInited = True
         if isinstance(cols, tuple):
@@ -374,6 +469,24 @@ class Table(object):
     def _getTableName(self):
         return self.__tableName
 
+    def _setSource(self, dbPath, tableName):
+        # the DFS table behind the variable, so that other connections can load it
+        self.__source = (dbPath, tableName)
+
+    def _sourceTag(self):
+        # the name under which the cached results of the DFS table are invalidated, whatever the variable of the handle
+        if self.__source is None:
+            return None
+        return 'loadTable("{}","{}")'.format(*self.__source)
+
+    def __runCached(self, query):
+        sourceTag = self._sourceTag()
+        if sourceTag is None:
+            return self.__session.run(query, useCache=True)
+        # key the result on the DFS table instead of the variable, which is different for each handle
+        cacheScript = re.sub(r"\b{}\b".format(re.escape(self.__tableName)), lambda m: sourceTag, query)
+        return self.__session.run(query, useCache=True, _cacheScript=cacheScript, _cacheTags=(sourceTag,))
+
     def _setLeftTable(self, tableName):
         self.__leftTable = tableName
 
@@ -1079,8 +1192,10 @@ class Table(object):
         if not isinstance(table, Table):
             raise RuntimeError("Only DolphinDB Table object is accepted")
 
+        self._detachShared()
         runstr = "%s.append!(%s)" % (self.tableName(), table.tableName())
         self.__session.run(runstr)
+        self.__session._tableModified(self.tableName(), self._sourceTag())
         return self
 
     def update(self, cols:List[str], vals:List[str]) -> Type["TableUpdate"]:
@@ -1094,6 +1209,7 @@ class Table(object):
             a TableUpdate object.
         """
         # print("update for ", self.__tableName)
+        self._detachShared()
         tmp = copy.copy(self)
         contextby = self.__contextby if hasattr(self, '__contextby') else None
         having = self.__having if hasattr(self, '__having') else None
@@ -1116,6 +1232,7 @@ class Table(object):
         Returns:
             a TableDelete object.
         """
+        self._detachShared()
         tmp = copy.copy(self)
         delTable = TableDelete(t=tmp)
         return delTable
@@ -1129,6 +1246,7 @@ class Table(object):
         Returns:
             a Table object.
         """
+        self._detachShared()
         if cols is not None and len(cols) and isinstance(cols, list):
             runstr = '{table}.drop!([{cols}])'
             fmtDict = dict()
@@ -1140,6 +1258,7 @@ class Table(object):
                     if col.lower() == colName.lower():
                         self.__select.remove(colName)
             self.__session.run(query)
+            self.__session._tableModified(self.tableName(), self._sourceTag())
         else:
             runstr = '{table}.drop!([{cols}])'
             fmtDict = dict()
@@ -1233,17 +1352,125 @@ class Table(object):
             # print(query)
             return self.__session.run(query)
 
-    def toDF(self) -> DataFrame:
+    def toDF(self, zeroCopy:bool=False, out:Optional[dict]=None, pool=None, parallel:bool=False) -> DataFrame:
         """Execute SQL statement and return a DataFrame object.
 
+        Args:
+            zeroCopy : whether to build the DataFrame on the received column buffers instead of copying them. Defaults to False.
+            out : dict of column name to preallocated numpy array to decode the columns into. Defaults to None. See session.run.
+            pool : DBConnectionPool used when parallel is True. Defaults to None.
+            parallel : whether to split the query by partition and fetch the parts concurrently over the connections of pool. Defaults to False.
+
         Returns:
             data queried by SQL in DataFrame form.
+
+        Note:
+            If the result cache of the session is enabled, the result is served from the cache when possible. zeroCopy=True and out bypass the cache.
+
+        Note:
+            parallel=True requires a DFS table loaded with its dbPath, and a plain select with where conditions only: top, limit, group by, context by,
+            csort, having, order by and exec cannot be evaluated partition by partition. The parts are concatenated in partition order.
+            Tables that are not partitioned, and select lists with function calls, which may be aggregates or order-dependent
+            like sum, distinct, cumsum or prev, are fetched over the session as usual.
         """
         self._init_schema()
+        if parallel:
+            if pool is None:
+                raise ValueError("pool must be provided when parallel is True")
+            return self.__parallelToDF(pool)
         query = self.showSQL()
-        df = self.__session.run(query)  # type: DataFrame
+        if out is not None:
+            return self.__session.run(query, out=out)
+        if zeroCopy:
+            return self.__session.run(query, zeroCopy=True)
+        df = self.__runCached(query)  # type: DataFrame
         return df
 
+    def __parallelToDF(self, pool):
+        if self.__source is None:
+            raise ValueError("parallel toDF requires a table loaded with its dbPath")
+        if self.isExec or self.__top or self.__having or self._assembleGroupbyOrContextby() or self._assembleCsort() \
+                or self._assembleOrderby() or self._assembleLimit():
+            raise ValueError("parallel toDF only supports select queries with where conditions")
+        query = self.showSQL()
+        try:
+            select = self.__select if isinstance(self.__select, list) else []
+        except AttributeError:
+            select = []
+        if not _select_is_row_wise(select):
+            # the columns would be computed per partition instead of over the whole table
+            return self.__runCached(query)
+        schema = self.__session.run("schema(%s)" % self.__tableName)
+        if not schema.get('partitionColumnName'):
+            return self.__runCached(query)
+        # the same data sources as Table.ols, each task materializes a contiguous range of them on its own connection
+        dsstr = "sqlDS(<SQLSQL>)".replace('SQLSQL', query)
+        numSources = self.__session.run("size(%s)" % dsstr)
+        numTasks = min(numSources, pool.threadNum * 4)
+        step = -(-numSources // numTasks) if numTasks else 0
+        loadstr = '{table} = loadTable("{dbPath}", "{name}")\n'.format(table=self.__tableName, dbPath=self.__source[0], name=self.__source[1])
+        runstr = loadstr + "unionAll(mr({ds}[{start}:{end}], x -> x), false)"
+        futures = [pool.runTaskAsync(runstr.format(ds=dsstr, start=start, end=min(start + step, numSources)))
+                   for start in range(0, numSources, step or 1)]
+        frames = [f.result() for f in futures]
+        if not frames:
+            return self.__session.run(query)
+        nonEmpty = [df for df in frames if len(df)]
+        if len(nonEmpty) <= 1:
+            return nonEmpty[0] if nonEmpty else frames[0]
+        return concat(nonEmpty, ignore_index=True, copy=False)
+
+    def toArrow(self):
+        """Execute SQL statement and return a pyarrow.Table object.
+
+        Returns:
+            data queried by SQL in pyarrow.Table form.
+
+        Note:
+            pyarrow is required. Numeric and most temporal columns share the buffers received from the server.
+        """
+        self._init_schema()
+        query = self.showSQL()
+        return self.__session.run(query, format="arrow")
+
+    def export(self, path:str, format:str="parquet", fetchSize:Union[int, str]=65536, prefetch:int=1) -> int:
+        """Execute SQL statement and write the result to a local file block by block.
+
+        Args:
+            path : path of the file to be written.
+            format : "parquet", "feather" or "csv". Defaults to "parquet".
+            fetchSize : the number of rows of each block, or "auto" to let the session choose it. Defaults to 65536. Cannot be less than 8192.
+            prefetch : the number of blocks received in the background while a block is written. Defaults to 1.
+
+        Returns:
+            the number of rows written.
+
+        Note:
+            Only one block, plus the prefetched ones, is held in memory at a time. See BlockReader.export.
+        """
+        self._init_schema()
+        query = self.showSQL()
+        reader = self.__session.run(query, fetchSize=fetchSize, prefetch=prefetch)
+        return reader.export(path, format=format)
+
+    def iterBatches(self, rows:Union[int, str]=65536, format:str="pandas", prefetch:int=1):
+        """Execute SQL statement and iterate over the result in blocks, without holding the full result in memory.
+
+        Args:
+            rows : the number of rows of each block, or "auto" to let the session choose it. Defaults to 65536. Cannot be less than 8192.
+            format : "pandas" yields DataFrames, "arrow" yields pyarrow.RecordBatch. Defaults to "pandas".
+            prefetch : the number of blocks received in the background while a block is processed. Defaults to 1.
+
+        Returns:
+            a generator of the blocks.
+
+        Note:
+            The query is executed when the iteration starts. The session must not run other scripts until the iteration ends.
+            If the generator is closed before the last block, the remaining blocks are skipped.
+        """
+        self._init_schema()
+        return _iter_batches(self.__session, self.showSQL(), rows, format, prefetch)
+
     def toList(self) -> list:
         """Execute SQL statement and return a List object.
 
@@ -1328,6 +1555,7 @@ class TableDelete(object):
         """
         query = self.showSQL()
         self.__t.session().run(query)  # type: DataFrame
+        self.__t.session()._tableModified(self.__t.tableName(), self.__t._sourceTag())
         return self.__t
 
     def toDF(self) -> DataFrame:
@@ -1462,9 +1690,11 @@ class TableUpdate(object):
         query = self.showSQL()
         #print(query)
         self.__t.session().run(query)  # type: DataFrame
+        self.__t.session()._tableModified(self.__t.tableName(), self.__t._sourceTag())
         t = Table(data=self.__t.tableName(), s=self.__t.session(), needGC=self.__t.__dict__["_Table__need_gc"])
         if self.__t.__dict__["_Table__need_gc"]:
             t.__dict__["_Table__ref"] = self.__t.__dict__["_Table__ref"]
+            t.__dict__["_Table__digest"] = self.__t.__dict__["_Table__digest"]
             t.__dict__["_Table__ref"].inc()
         return t
 
@@ -1512,6 +1742,14 @@ class TablePivotBy(object):
 
     toDataFrame = toDF
 
+    def iterBatches(self, rows:Union[int, str]=65536, format:str="pandas", prefetch:int=1):
+        """Execute SQL statement and iterate over the result in blocks of DataFrames or pyarrow.RecordBatch. See Table.iterBatches.
+
+        Returns:
+            a generator of the blocks.
+        """
+        return _iter_batches(self.__t.session(), self.showSQL(), rows, format, prefetch)
+
     def _assembleSelect(self):
         if self.__val is not None:
             return self.__val if self.__agg is None else _getFuncName(self.__agg) + '(' + self.__val + ')'
@@ -1910,6 +2148,14 @@ class TableGroupby(object):
         df = self.__t.session().run(query)  # type: DataFrame
         return df
 
+    def iterBatches(self, rows:Union[int, str]=65536, format:str="pandas", prefetch:int=1):
+        """Execute SQL statement and iterate over the result in blocks of DataFrames or pyarrow.RecordBatch. See Table.iterBatches.
+
+        Returns:
+            a generator of the blocks.
+        """
+        return _iter_batches(self.__t.session(), self.showSQL(), rows, format, prefetch)
+
 class TableContextby(object):
     """The table object to add the context by clause.
 
@@ -2322,6 +2568,14 @@ class TableContextby(object):
         df = self.__t.session().run(query)  # type : DataFrame
         return df
 
+    def iterBatches(self, rows:Union[int, str]=65536, format:str="pandas", prefetch:int=1):
+        """Execute SQL statement and iterate over the result in blocks of DataFrames or pyarrow.RecordBatch. See Table.iterBatches.
+
+        Returns:
+            a generator of the blocks.
+        """
+        return _iter_batches(self.__t.session(), self.showSQL(), rows, format, prefetch)
+
 
 wavg = TableGroupby.wavg
 wsum = TableGroupby.wsum